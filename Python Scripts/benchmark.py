@@ -0,0 +1,281 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import os
+import argparse
+import contextlib
+import json
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from utility_scripts.directory_scanner import ScanDirectory
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+CASES = ["iterative", "rename", "merge", "copy", "mirror", "startup"]
+TREE_CASES = CASES[:-1]
+STARTUP_COMMANDS = ["merge", "copy", "mirror", "sync", "number", "rename"]
+STARTUP_CALLS = 100 # in-process calls of the API timed by the startup case
+STARTUP_REPEAT = 5 # process starts timed per command, the fastest counts
+DIGIT_PATTERNS = ["plain", "padded", "mixed"]
+DATA_BLOCK_SIZE = 1024 * 1024 # random block file contents are sliced from
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def GetFileName(rng, pattern, index):
+    # Names with numbers in them the way they tend to show up, so sorting and numbering are exercised
+    ext = rng.choice([".jpg", ".png", ".txt", ".mp4"])
+    if pattern == "plain":
+        return "file" + str(index) + ext
+    if pattern == "padded":
+        return "IMG_" + str(index).zfill(5) + ext
+    return "track" + str(rng.randint(1, 99)) + " part" + str(index) + ext
+
+def GetFileSize(rng, median, sigma):
+    if sigma <= 0:
+        return median
+    return int(rng.lognormvariate(0, sigma) * median)
+
+def GenerateTree(root, files, median, sigma, depth, fanout, pattern, collisions, seed):
+    # Generate the same source tree and a destination holding a share of its files under the same name (with
+    # other content) for every seed.
+    rng = random.Random(seed)
+    data = bytes(rng.getrandbits(8) for _ in range(DATA_BLOCK_SIZE))
+    source = os.path.join(root, "source")
+    dest = os.path.join(root, "dest")
+    dirs = [source]
+    level = [source]
+    for _ in range(depth):
+        level = [os.path.join(parent, "dir" + str(index)) for parent in level for index in range(fanout)]
+        dirs.extend(level)
+    for dir in dirs:
+        os.makedirs(dir)
+    for index in range(files):
+        dir = rng.choice(dirs)
+        name = GetFileName(rng, pattern, index)
+        size = GetFileSize(rng, median, sigma)
+        offset = rng.randrange(DATA_BLOCK_SIZE)
+        with open(os.path.join(dir, name), "wb") as file:
+            remaining = size
+            while remaining > 0:
+                chunk = data[offset:offset + remaining] or data[:remaining]
+                file.write(chunk)
+                remaining -= len(chunk)
+                offset = 0
+        if rng.random() < collisions:
+            destDir = os.path.join(dest, os.path.relpath(dir, source))
+            os.makedirs(destDir, exist_ok=True)
+            with open(os.path.join(destDir, name), "wb") as file:
+                file.write(data[:rng.randint(1, 4096)])
+    os.makedirs(dest, exist_ok=True)
+
+def GetIoCounters():
+    # Read and write syscalls made by this process so far (Linux only). Kernel-side copies (copy_file_range,
+    # sendfile) move their data without counting as reads or writes.
+    try:
+        with open("/proc/self/io", "r") as ioFile:
+            counters = dict(line.split(": ") for line in ioFile.read().splitlines())
+        return {"readSyscalls": int(counters["syscr"]), "writeSyscalls": int(counters["syscw"]),
+                "readBytes": int(counters["rchar"]), "writeBytes": int(counters["wchar"])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+def GetPeakRss():
+    # Peak resident set size of this process in bytes
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes everywhere but macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def RunCase(case, source, dest):
+    # Run one entry point on the prepared tree in this (fresh) process
+    sys.path.insert(0, SCRIPT_DIRECTORY)
+    if case == "iterative":
+        from utility_scripts.copy_file_iterative import DoBulkMerge
+        run = lambda: DoBulkMerge(dest, source, 0, 1, "", "", False, quiet=True)
+    elif case == "rename":
+        from utility_scripts.rename_file_by_folder_name import DoBulkRename
+        run = lambda: DoBulkRename(source, 2, 1, "", "", shallow=False, quiet=True)
+    else:
+        from utility_scripts import sync_folder
+        if case == "merge":
+            run = lambda: sync_folder.DoMerge(source, dest, False, python=True)
+        elif case == "copy":
+            run = lambda: sync_folder.DoCopy(source, dest, False, False, python=True)
+        else:
+            run = lambda: sync_folder.DoMirror(source, dest, False, False, python=True)
+    before = GetIoCounters()
+    startTime = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        run()
+    result = {"wallTime": time.perf_counter() - startTime, "peakRss": GetPeakRss()}
+    after = GetIoCounters()
+    if before is not None and after is not None:
+        result.update({key: after[key] - before[key] for key in after})
+    return result
+
+def CountFiles(source, case):
+    # Files and bytes the case works on, the iterative copy only takes the files directly in each subdirectory
+    if case == "iterative":
+        dirs = [entry.path for entry in ScanDirectory(source, directory=True)]
+        entries = [entry for dir in dirs for entry in ScanDirectory(dir, withStat=True)]
+    else:
+        entries = list(ScanDirectory(source, shallow=False, withStat=True))
+    return len(entries), sum(entry.size for entry in entries)
+
+def BenchmarkCase(case, template, workDir):
+    # Each run works on a fresh copy of the generated tree in its own process, so runs cannot affect each other
+    runDir = os.path.join(workDir, case)
+    shutil.copytree(template, runDir, symlinks=True)
+    source = os.path.join(runDir, "source")
+    dest = os.path.join(runDir, "dest")
+    if case == "iterative":
+        dest = os.path.join(runDir, "numbered")
+        os.makedirs(dest)
+    files, totalBytes = CountFiles(source, case)
+    env = dict(os.environ, XDG_CACHE_HOME=os.path.join(runDir, "cache"))
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-case", case, source, dest],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, universal_newlines=True)
+    shutil.rmtree(runDir, ignore_errors=True)
+    result = {"case": case, "files": files, "bytes": totalBytes}
+    if process.returncode != 0:
+        result["error"] = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "exit code " + str(process.returncode)
+        return result
+    result.update(json.loads(process.stdout.strip().splitlines()[-1]))
+    elapsed = max(result["wallTime"], 1e-9)
+    result["filesPerSecond"] = files / elapsed
+    result["bytesPerSecond"] = totalBytes / elapsed
+    return result
+
+def TimeCommand(command, repeat):
+    # Best wall time of a process over repeat runs, the least disturbed by the rest of the system
+    times = []
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - startTime)
+    return min(times)
+
+def TimeApiCalls(source, dest):
+    # Average time of an in-process copy of a small tree through the API once the modules are loaded
+    sys.path.insert(0, SCRIPT_DIRECTORY)
+    import utility_scripts
+    utility_scripts.Copy(source, dest)
+    startTime = time.perf_counter()
+    for _ in range(STARTUP_CALLS):
+        utility_scripts.Copy(source, dest)
+    return (time.perf_counter() - startTime) / STARTUP_CALLS
+
+def BenchmarkStartup(workDir, repeat):
+    # Time from starting the interpreter to a parsed command line of every command (by showing its help), next to
+    # an interpreter doing nothing, and the cost of a call through the API when no interpreter has to be started
+    results = [{"case": "startup", "command": None, "wallTime": TimeCommand([sys.executable, "-c", "pass"], repeat)}]
+    cli = os.path.join(SCRIPT_DIRECTORY, "utility_scripts")
+    for command in STARTUP_COMMANDS:
+        results.append({"case": "startup", "command": command, "wallTime": TimeCommand([sys.executable, cli, command, "--help"], repeat)})
+    runDir = os.path.join(workDir, "startup")
+    GenerateTree(runDir, 10, 1024, 0, 1, 2, "plain", 0, 0)
+    env = dict(os.environ, XDG_CACHE_HOME=os.path.join(runDir, "cache"))
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-api", os.path.join(runDir, "source"), os.path.join(runDir, "dest")],
+                             stdout=subprocess.PIPE, env=env, universal_newlines=True, check=True)
+    shutil.rmtree(runDir, ignore_errors=True)
+    results.append({"case": "startup", "command": "api", "wallTime": float(process.stdout.strip())})
+    return results
+
+def GetRevision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIRECTORY, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def DoBenchmark(args):
+    config = {"files": args.files, "sizeMedian": args.size, "sizeSigma": args.sigma, "depth": args.depth,
+              "fanout": args.fanout, "digits": args.digits, "collisions": args.collisions, "seed": args.seed}
+    report = {"revision": GetRevision(), "python": platform.python_version(), "platform": platform.platform(),
+              "config": config, "results": []}
+    workDir = tempfile.mkdtemp(prefix="utility-benchmark-", dir=args.temp)
+    try:
+        template = os.path.join(workDir, "template")
+        if any(case in TREE_CASES for case in args.cases):
+            if not args.quiet:
+                print("Generating " + str(args.files) + " files in: '" + template + "'", file=sys.stderr)
+            GenerateTree(template, args.files, args.size, args.sigma, args.depth, args.fanout, args.digits, args.collisions, args.seed)
+        for repeat in range(args.repeat):
+            for case in args.cases:
+                if not args.quiet:
+                    print("Running " + case + " (" + str(repeat + 1) + "/" + str(args.repeat) + ")", file=sys.stderr)
+                if case == "startup":
+                    results = BenchmarkStartup(workDir, STARTUP_REPEAT)
+                else:
+                    results = [BenchmarkCase(case, template, workDir)]
+                for result in results:
+                    result["run"] = repeat
+                    report["results"].append(result)
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as outputFile:
+            outputFile.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--run-case":
+        print(json.dumps(RunCase(*sys.argv[2:])))
+        sys.exit()
+    if len(sys.argv) == 4 and sys.argv[1] == "--run-api":
+        print(TimeApiCalls(*sys.argv[2:]))
+        sys.exit()
+
+    parser = argparse.ArgumentParser(description="Benchmark the utility scripts on a generated tree of files, reporting wall time, files/s, bytes/s, syscall counts and peak memory of every run as JSON. The same seed always generates the same tree, so results can be compared across versions. The startup case times starting every command of utility_scripts and calling its API in-process instead.")
+    parser.add_argument("cases", nargs="*", metavar="case", help="Entry points to run: " + ", ".join(CASES) + ". Default=all")
+    parser.add_argument("-n", "--files", type=int, default=2000, help="Number of files to generate. Default=2000")
+    parser.add_argument("-s", "--size", type=int, default=16 * 1024, help="Median file size in bytes. Default=16384")
+    parser.add_argument("--sigma", type=float, default=1.0, help="Spread of the log-normal file size distribution, 0 for equal sizes. Default=1.0")
+    parser.add_argument("-d", "--depth", type=int, default=2, help="Levels of subdirectories. Default=2")
+    parser.add_argument("-f", "--fanout", type=int, default=4, help="Subdirectories per directory. Default=4")
+    parser.add_argument("-g", "--digits", choices=DIGIT_PATTERNS, default="mixed", help="How numbers appear in file names: plain (file12), padded (IMG_00012) or mixed (track3 part12). Default=mixed")
+    parser.add_argument("-c", "--collisions", type=float, default=0.1, help="Share of files that also exist in the destination under the same name. Default=0.1")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="Number of times every case is run. Default=1")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated tree. Default=0")
+    parser.add_argument("-t", "--temp", type=str, help="Directory to generate the trees in, to benchmark a particular filesystem. Default is the system temporary directory.")
+    parser.add_argument("-o", "--output", type=str, help="Write the JSON report to this file instead of the console.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not report progress.")
+
+    args = parser.parse_args()
+    # choices cannot be combined with an empty list of cases
+    for case in args.cases:
+        if case not in CASES:
+            parser.error("invalid case: '" + case + "' (choose from " + ", ".join(CASES) + ")")
+    args.cases = args.cases or CASES
+    DoBenchmark(args)
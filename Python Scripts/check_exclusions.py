@@ -0,0 +1,180 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import os
+import argparse
+import contextlib
+import fnmatch
+import shutil
+import tempfile
+
+
+CASES = ["mirror", "merge", "twoway"]
+EXCLUDE_DIRS = ["node_modules", ".git"]
+EXCLUDE_FILES = ["*.tmp"]
+RUNS = 2 # runs of every case, the second one works from the state saved by the first
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# files of the generated trees, the excluded ones exist on both sides so purging and copying them is exercised too
+SOURCE_FILES = ["keep/a.txt", "keep/b.tmp", "keep/sub/c.txt", "keep/node_modules/pkg/index.js", "node_modules/pkg/deep/lib.js",
+                ".git/objects/ab/cdef", "keep/sub/.git/HEAD", "top.tmp"]
+DEST_FILES = ["keep/a.txt", "keep/extra.txt", "keep/old.tmp", "node_modules/stale/x.js", ".git/config", "keep/sub/.git/index"]
+
+
+def IsExcludedPath(path, roots):
+    # Whether path lies in an excluded directory or is an excluded file below one of the roots
+    path = os.path.abspath(os.fsdecode(path))
+    for root in roots:
+        relPath = os.path.relpath(path, root)
+        if relPath == os.curdir or relPath == os.pardir or relPath.startswith(os.pardir + os.sep):
+            continue
+        parts = relPath.split(os.sep)
+        if any(part in EXCLUDE_DIRS for part in parts):
+            return True
+        return any(fnmatch.fnmatch(parts[-1], pattern) for pattern in EXCLUDE_FILES)
+    return False
+
+class CheckedEntry:
+    # Directory entry reporting every stat of it, anything else is passed on to the real entry
+    def __init__(self, entry, onStat):
+        self.entry = entry
+        self.onStat = onStat
+
+    def __getattr__(self, name):
+        return getattr(self.entry, name)
+
+    def __fspath__(self):
+        return self.entry.path
+
+    def stat(self, *, follow_symlinks=True):
+        self.onStat(self.entry.path)
+        return self.entry.stat(follow_symlinks=follow_symlinks)
+
+class CheckedIterator:
+    def __init__(self, iterator, onStat):
+        self.iterator = iterator
+        self.onStat = onStat
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.iterator.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return CheckedEntry(next(self.iterator), self.onStat)
+
+    def close(self):
+        self.iterator.close()
+
+@contextlib.contextmanager
+def CheckedFilesystem(roots, touched):
+    # Replace os.stat, os.lstat and os.scandir while running, adding every excluded path they are called on to
+    # touched. os.path and shutil reach the filesystem through them as well.
+    realStat, realLstat, realScandir = os.stat, os.lstat, os.scandir
+
+    def Check(path):
+        if isinstance(path, (str, bytes, os.PathLike)) and IsExcludedPath(path, roots):
+            touched.add(os.path.abspath(os.fsdecode(path)))
+
+    def CheckedStat(path, *args, **kwargs):
+        Check(path)
+        return realStat(path, *args, **kwargs)
+
+    def CheckedLstat(path, *args, **kwargs):
+        Check(path)
+        return realLstat(path, *args, **kwargs)
+
+    def CheckedScandir(path=os.curdir):
+        Check(path)
+        return CheckedIterator(realScandir(path), Check)
+
+    os.stat, os.lstat, os.scandir = CheckedStat, CheckedLstat, CheckedScandir
+    try:
+        yield
+    finally:
+        os.stat, os.lstat, os.scandir = realStat, realLstat, realScandir
+
+def GenerateTree(root):
+    for side, files in (("source", SOURCE_FILES), ("dest", DEST_FILES)):
+        for relPath in files:
+            path = os.path.join(root, side, *relPath.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write(side + " " + relPath + "\n")
+
+def RunCase(case, root):
+    # Returns the excluded paths touched by any run of the case
+    from utility_scripts import sync_folder
+    from utility_scripts.path_filter import PathFilter
+    source = os.path.join(root, "source")
+    dest = os.path.join(root, "dest")
+    pathFilter = PathFilter(EXCLUDE_DIRS, EXCLUDE_FILES)
+    if case == "mirror":
+        run = lambda: sync_folder.DoMirror(source, dest, False, False, python=True, pathFilter=pathFilter)
+    elif case == "merge":
+        run = lambda: sync_folder.DoMerge(source, dest, False, python=True, pathFilter=pathFilter)
+    else:
+        run = lambda: sync_folder.TwoWaySync(source, dest, False, pathFilter=pathFilter).Sync()
+    touched = set()
+    for _ in range(RUNS):
+        with CheckedFilesystem([source, dest], touched), contextlib.redirect_stdout(open(os.devnull, "w")):
+            run()
+    return sorted(touched)
+
+def DoCheck(args):
+    sys.path.insert(0, SCRIPT_DIRECTORY)
+    workDir = tempfile.mkdtemp(prefix="utility-exclusions-", dir=args.temp)
+    # saved manifests and state stay out of the real cache
+    os.environ["XDG_CACHE_HOME"] = os.path.join(workDir, "cache")
+    failed = False
+    try:
+        for case in args.cases:
+            root = os.path.join(workDir, case)
+            GenerateTree(root)
+            touched = RunCase(case, root)
+            if touched:
+                failed = True
+                print(case + ": " + str(len(touched)) + " excluded paths touched")
+                for path in touched:
+                    print("    " + os.path.relpath(path, root))
+            else:
+                print(case + ": ok")
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that directories and files excluded from syncing are never stated or listed. Merge, mirror and two-way sync are run twice each on a generated tree with " + ", ".join(EXCLUDE_DIRS + EXCLUDE_FILES) + " excluded while os.stat, os.lstat and os.scandir report every excluded path they are called on. Exits with 1 if any was.")
+    parser.add_argument("cases", nargs="*", metavar="case", help="Sync modes to check: " + ", ".join(CASES) + ". Default=all")
+    parser.add_argument("-t", "--temp", type=str, help="Directory to generate the trees in. Default is the system temporary directory.")
+
+    args = parser.parse_args()
+    # choices cannot be combined with an empty list of cases
+    for case in args.cases:
+        if case not in CASES:
+            parser.error("invalid case: '" + case + "' (choose from " + ", ".join(CASES) + ")")
+    args.cases = args.cases or CASES
+    sys.exit(DoCheck(args))
@@ -0,0 +1,157 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import sys
+import argparse
+import importlib
+
+
+# command -> (module implementing it, help), a module is only imported once its command runs
+COMMANDS = {
+    "merge": ("sync_folder", "Merge source into destination, numbering files that share a name but differ in content."),
+    "copy": ("sync_folder", "Copy source into destination, overwriting files that share a name."),
+    "mirror": ("sync_folder", "Mirror source into destination, purging files not found in source."),
+    "sync": ("sync_folder", "Keep source and destination in sync continuously, two-way unless -a or -y is given."),
+    "number": ("copy_file_iterative", "Copy files from source directories to destination numbered in consecutive order."),
+    "rename": ("rename_file_by_folder_name", "Rename files after the directory they are in."),
+}
+
+
+def GetPathFilter(excludeDirs=(), excludeFiles=(), includeFiles=()):
+    if not excludeDirs and not excludeFiles and not includeFiles:
+        return None
+    from utility_scripts.path_filter import PathFilter
+    return PathFilter(excludeDirs, excludeFiles, includeFiles)
+
+def GetDeviceLimits(deviceWorkers=None, bandwidth=None, deviceLimits=()):
+    # deviceLimits holds (path, concurrency, bandwidth) of single devices
+    if deviceWorkers is None and bandwidth is None and not deviceLimits:
+        return None
+    from utility_scripts.io_scheduler import DeviceLimits
+    return DeviceLimits(deviceWorkers, bandwidth, deviceLimits)
+
+def GetVerifier(verify, retries, stats):
+    if not verify:
+        return None
+    from utility_scripts.file_verifier import Verifier
+    return Verifier(retries=retries, stats=stats)
+
+# The functions below run the scripts in the calling process without printing anything and return the
+# Instrumentation of the run (files, bytes, errors, phases). Pass stats to add up several runs or to listen for
+# events with hooks. Syncs always use the python implementation. Copies run at most deviceWorkers at once and
+# bandwidth bytes/s from or to each device unless deviceLimits sets other limits for a device.
+
+def Merge(source, dest, twoway=False, link=None, verify=False, retries=0, excludeDirs=(), excludeFiles=(), includeFiles=(), stats=None,
+          deviceWorkers=None, bandwidth=None, deviceLimits=()):
+    from utility_scripts import sync_folder
+    stats = stats or sync_folder.CopyStats()
+    sync_folder.DoMerge(source, dest, twoway, python=True, link=link, stats=stats, verifier=GetVerifier(verify, retries, stats),
+                        pathFilter=GetPathFilter(excludeDirs, excludeFiles, includeFiles), deviceLimits=GetDeviceLimits(deviceWorkers, bandwidth, deviceLimits))
+    return stats
+
+def Copy(source, dest, modTime=False, twoway=False, delta=False, rescan=False, verify=False, retries=0, excludeDirs=(), excludeFiles=(), includeFiles=(), stats=None,
+         deviceWorkers=None, bandwidth=None, deviceLimits=()):
+    from utility_scripts import sync_folder
+    stats = stats or sync_folder.CopyStats()
+    sync_folder.DoCopy(source, dest, modTime, twoway, python=True, rescan=rescan, delta=delta, stats=stats, verifier=GetVerifier(verify, retries, stats),
+                       pathFilter=GetPathFilter(excludeDirs, excludeFiles, includeFiles), deviceLimits=GetDeviceLimits(deviceWorkers, bandwidth, deviceLimits))
+    return stats
+
+def Mirror(source, dest, modTime=False, twoway=False, delta=False, rescan=False, verify=False, retries=0, excludeDirs=(), excludeFiles=(), includeFiles=(), stats=None,
+           deviceWorkers=None, bandwidth=None, deviceLimits=()):
+    from utility_scripts import sync_folder
+    stats = stats or sync_folder.CopyStats()
+    sync_folder.DoMirror(source, dest, modTime, twoway, python=True, rescan=rescan, delta=delta, stats=stats, verifier=GetVerifier(verify, retries, stats),
+                         pathFilter=GetPathFilter(excludeDirs, excludeFiles, includeFiles), deviceLimits=GetDeviceLimits(deviceWorkers, bandwidth, deviceLimits))
+    return stats
+
+def Sync(source, dest, mode="twoway", modTime=False, delta=False, rescan=False, excludeDirs=(), excludeFiles=(), includeFiles=(),
+         deviceWorkers=None, bandwidth=None, deviceLimits=()):
+    # Start syncing continuously in the background, mode is "twoway", "copy" or "mirror". Returns the monitor,
+    # Stop and then Join it to finish syncing. Requires watchdog.
+    from utility_scripts import sync_folder
+    pathFilter = GetPathFilter(excludeDirs, excludeFiles, includeFiles)
+    limits = GetDeviceLimits(deviceWorkers, bandwidth, deviceLimits)
+    if mode == "twoway":
+        return sync_folder.InitTwoWayMonitor(source, dest, modTime, rescan=rescan, delta=delta, pathFilter=pathFilter, deviceLimits=limits)
+    funcOnEvent = {"copy": sync_folder.DoCopy, "mirror": sync_folder.DoMirror}[mode]
+    return sync_folder.InitMonitor(source, dest, modTime, funcOnEvent, python=True, delta=delta, pathFilter=pathFilter, deviceLimits=limits)
+
+def Number(dest, sourceList=None, bulk=None, initial=0, counter=1, prefix="", suffix="", override=False, journal=False, link=None, verify=False, retries=0, workers=None, stats=None, archive=None, compression=None):
+    # Copy the files of sourceList, or of every subdirectory of bulk, to dest numbered in consecutive order, or
+    # into a tar or zip archive at dest when given an archive format
+    from utility_scripts import copy_file_iterative
+    from utility_scripts.instrumentation import Instrumentation
+    stats = stats or Instrumentation()
+    workers = workers or copy_file_iterative.COPY_WORKERS
+    destDir = os.path.dirname(os.path.abspath(dest)) if archive else dest
+    os.makedirs(destDir, exist_ok=True)
+    if bulk:
+        copy_file_iterative.DoBulkMerge(dest, bulk, initial, counter, prefix, suffix, override, quiet=True, workers=workers, journal=journal, link=link,
+                                        stats=stats, verifier=GetVerifier(verify, retries, stats), archive=archive, compression=compression)
+    else:
+        copy_file_iterative.DoIterativeMerge(dest, sourceList, initial, counter, prefix, suffix, override, quiet=True, workers=workers, journal=journal,
+                                             link=link, stats=stats, verifier=GetVerifier(verify, retries, stats), archive=archive, compression=compression)
+    return stats
+
+def Rename(sourceList=None, bulk=None, initial=2, counter=1, prefix="", suffix="", keep=False, deep=False, dryRun=False, workers=1, logPath=None, stats=None):
+    # Rename the files of sourceList, or of every subdirectory of bulk, after the directory they are in
+    from utility_scripts import rename_file_by_folder_name
+    from utility_scripts.instrumentation import Instrumentation
+    stats = stats or Instrumentation()
+    if bulk:
+        rename_file_by_folder_name.DoBulkRename(bulk, initial, counter, prefix, suffix, keep, not deep, quiet=True, dryRun=dryRun, workers=workers,
+                                                logPath=logPath, stats=stats)
+    else:
+        rename_file_by_folder_name.DoRename(sourceList, initial, counter, prefix, suffix, keep, not deep, quiet=True, dryRun=dryRun, workers=workers,
+                                            logPath=logPath, stats=stats)
+    return stats
+
+def Undo(logPath, stats=None):
+    # Roll back the renames recorded in an undo log
+    from utility_scripts import rename_file_by_folder_name
+    from utility_scripts.instrumentation import Instrumentation
+    stats = stats or Instrumentation()
+    rename_file_by_folder_name.DoUndo(logPath, quiet=True, stats=stats)
+    return stats
+
+def Main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(prog="utility-scripts", description="Merge, copy, mirror or continuously sync directories, copy files numbered in consecutive order or rename files after their directory. Run a command with -h for its options.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+    # only the arguments of the command being run are added, so only its module is imported
+    chosen = argv[0] if argv else None
+    module = None
+    for command, (moduleName, help) in COMMANDS.items():
+        subparser = subparsers.add_parser(command, help=help, description=help)
+        if command == chosen:
+            module = importlib.import_module("utility_scripts." + moduleName)
+            if moduleName == "sync_folder":
+                module.AddArguments(subparser, command)
+            else:
+                module.AddArguments(subparser)
+    args = parser.parse_args(argv)
+    module.Main(args)
+
@@ -0,0 +1,96 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import shutil
+
+
+ARCHIVE_FORMATS = ["tar", "zip"]
+ARCHIVE_COMPRESSIONS = ["gz", "bz2", "xz"]
+# zip compression methods standing in for the tar compressions, as defined in zipfile
+ZIP_COMPRESSIONS = {None: "ZIP_STORED", "gz": "ZIP_DEFLATED", "bz2": "ZIP_BZIP2", "xz": "ZIP_LZMA"}
+ARCHIVE_BUFFER_SIZE = 1024 * 1024
+
+
+class ArchiveError(Exception):
+    # The archive could not be created, or writing it failed part way through an entry so it cannot be
+    # written any further
+    pass
+
+class ArchiveWriter:
+    # Writes files into a tar or zip archive as they come, in a single pass over the output without seeking
+    # back, so the archive can also be a pipe. Files are named as given, an entry added under a name already
+    # in the archive replaces the earlier one on extraction. Adding a file that cannot be opened raises
+    # OSError and leaves the archive as it was, a failure while writing raises ArchiveError. Not thread safe.
+    def __init__(self, path, format="tar", compression=None):
+        # tarfile and zipfile are only imported for an archive, they are slow to import
+        try:
+            # buffered here rather than by tarfile, which grows its stream buffer by copying it on every write
+            self.file = open(path, "wb", buffering=ARCHIVE_BUFFER_SIZE)
+        except OSError as error:
+            raise ArchiveError("Failed creating '" + path + "': " + str(error)) from error
+        self.format = format
+        try:
+            if format == "tar":
+                import tarfile
+                self.archive = tarfile.open(fileobj=self.file, mode="w|" + (compression or ""), format=tarfile.GNU_FORMAT)
+            else:
+                import zipfile
+                self.archive = zipfile.ZipFile(self.file, "w", getattr(zipfile, ZIP_COMPRESSIONS[compression]))
+        except BaseException:
+            self.file.close()
+            raise
+
+    def Add(self, sourceName, name):
+        # Returns the size of the file added
+        with open(sourceName, "rb") as sourceFile:
+            if self.format == "tar":
+                info = self.archive.gettarinfo(arcname=name, fileobj=sourceFile)
+                size = info.size
+            else:
+                import zipfile
+                info = zipfile.ZipInfo.from_file(sourceName, name)
+                # from_file leaves entries stored uncompressed
+                info.compress_type = self.archive.compression
+                size = info.file_size
+            # nothing was written until here
+            try:
+                if self.format == "tar":
+                    self.archive.addfile(info, sourceFile)
+                else:
+                    with self.archive.open(info, "w") as destFile:
+                        shutil.copyfileobj(sourceFile, destFile, ARCHIVE_BUFFER_SIZE)
+                return size
+            except OSError as error:
+                raise ArchiveError("Failed adding '" + sourceName + "' as '" + name + "': " + str(error)) from error
+
+    def Close(self):
+        try:
+            self.archive.close()
+        finally:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.Close()
@@ -0,0 +1,569 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import os
+import argparse
+import shutil
+import re
+import json
+import threading
+import time
+if __name__ == "__main__" and not __package__:
+    # run as a script, the package is imported from the directory holding it
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utility_scripts.directory_scanner import ScanDirectory, ScanEntry
+from utility_scripts.path_utils import NormalizePath, IsValidDirectory, GetDirname, SplitFilepath, CheckSources
+from utility_scripts.file_linker import FileLinker, LINK_MODES, LINK_EVENTS, LINK_HARDLINK
+from utility_scripts.instrumentation import Instrumentation
+from utility_scripts.copy_pipeline import CopyPipeline
+from utility_scripts.archive_writer import ArchiveWriter, ArchiveError, ARCHIVE_FORMATS, ARCHIVE_COMPRESSIONS
+
+
+DESCRIPTION = "Copy files from all source directories such that files in the destination are numbered in consecutive order. Options for new filename can be set by the user. Files and directories are sorted by name in natural order, such that numbers within names are compared by value. Shallow copy only such that subdirectories will not be traversed."
+
+COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+COPY_QUEUE_FACTOR = 4 # max planned copies queued per worker before planning blocks
+NATURAL_TOKENS = re.compile(r"([0-9]+)")
+JOURNAL_NAME = ".copy_file_iterative.jsonl"
+JOURNAL_SAVE_INTERVAL = 5.0 # minimum seconds between journal saves while copying
+WATCH_SETTLE_TIME = 2.0 # seconds a new file must stay unchanged before it is copied, unless it was seen closed
+WATCH_POLL_INTERVAL = 0.5
+
+
+def GetNaturalKey(string):
+    # Natural sort key as a single string so comparisons stay in C. The name is split into alternating text and
+    # number tokens joined by NUL, which sorts below any character so shorter text comes first. Text is compared
+    # case-insensitively and numbers by value, encoded as their digit count followed by the digits.
+    tokens = NATURAL_TOKENS.split(string.casefold())
+    tokens[1::2] = [chr(len(digits) + 1) + digits for digits in [number.lstrip("0") for number in tokens[1::2]]]
+    return "\0".join(tokens)
+
+def GetSortKey(name, directory=False):
+    # Natural order of the names (without extension for files), ties broken by the exact name so the order is total
+    return GetNaturalKey(name if directory else os.path.splitext(name)[0]), name
+
+def SortEntryList(entryList, directory=False):
+    return sorted(entryList, key=lambda entry: GetSortKey(entry.name, directory))
+
+class CopyJournal:
+    # Record kept in the destination of the numbered name given to every source file, by absolute path, with the
+    # size and mtime it was copied at: [size, mtime_ns, destination name, destination size once copied].
+    # The journal is only appended to, a JSON line for every file planned or copied and for every new next value
+    # after a header line with the settings, so a save writes just what changed since the last one. Later lines
+    # replace earlier ones of the same file, a journal holding mostly replaced lines is rewritten on its first
+    # save. A journal written with a different prefix, suffix, counter or override is ignored.
+    VERSION = 2
+
+    def __init__(self, dest, counter, prefix, suffix, override):
+        self.path = os.path.join(dest, JOURNAL_NAME)
+        self.settings = [counter, prefix, suffix, override]
+        self.files = {}
+        self.next = None
+        self.pending = [] # lines not saved yet
+        self.valid = 0 # bytes of the journal on disk holding whole lines
+        self.rewrite = True
+        # reentrant as MarkCopied saves while holding it
+        self.lock = threading.RLock()
+        self.lastSave = time.monotonic()
+
+    def Load(self):
+        try:
+            with open(self.path, "rb") as file:
+                lines = file.read().split(b"\n")
+            header = json.loads(lines[0])
+            if len(lines) < 2 or header["version"] != self.VERSION or header["settings"] != self.settings:
+                return self
+        except (OSError, ValueError, KeyError, TypeError):
+            return self
+        self.valid = len(lines[0]) + 1
+        count = 0
+        # the last piece is empty unless a save was interrupted in the middle of a line
+        for line in lines[1:-1]:
+            try:
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    self.next = record["next"]
+                else:
+                    self.files[record[0]] = record[1:5]
+            except (ValueError, KeyError, TypeError, IndexError):
+                break
+            self.valid += len(line) + 1
+            count += 1
+        self.rewrite = count > 2 * len(self.files)
+        return self
+
+    def Get(self, sourceName):
+        return self.files.get(os.path.abspath(sourceName))
+
+    def IsCopied(self, record, entry, destName):
+        if record[0] != entry.size or record[1] != entry.mtime or record[3] is None:
+            return False
+        try:
+            return os.path.getsize(destName) == record[3]
+        except OSError:
+            return False
+
+    def Plan(self, sourceName, entry, destName):
+        sourceName = os.path.abspath(sourceName)
+        record = self.files[sourceName] = [entry.size, entry.mtime, os.path.basename(destName), None]
+        self.pending.append([sourceName] + record)
+
+    def SetNext(self, value):
+        if value != self.next:
+            self.next = value
+            self.pending.append({"next": value})
+
+    def MarkCopied(self, sourceName, destName):
+        with self.lock:
+            sourceName = os.path.abspath(sourceName)
+            record = self.files[sourceName]
+            record[3] = os.path.getsize(destName)
+            self.pending.append([sourceName] + record)
+            if time.monotonic() - self.lastSave >= JOURNAL_SAVE_INTERVAL:
+                self.Save()
+
+    def Save(self):
+        with self.lock:
+            if self.rewrite:
+                self.Rewrite()
+            elif self.pending:
+                data = "".join(json.dumps(line, separators=(",", ":")) + "\n" for line in self.pending).encode("utf-8")
+                with open(self.path, "ab") as file:
+                    # drop what is left of a line an interrupted save did not finish
+                    if file.tell() != self.valid:
+                        file.truncate(self.valid)
+                    file.write(data)
+                    file.flush()
+                    os.fsync(file.fileno())
+                self.valid += len(data)
+                self.pending = []
+            self.lastSave = time.monotonic()
+
+    def Rewrite(self):
+        # written to a temporary file first so the journal on disk is always either the old or the new one
+        tempPath = self.path + "." + str(os.getpid()) + ".tmp"
+        lines = [{"version": self.VERSION, "settings": self.settings}]
+        lines.extend([sourceName] + record for sourceName, record in self.files.items())
+        if self.next is not None:
+            lines.append({"next": self.next})
+        data = "".join(json.dumps(line, separators=(",", ":")) + "\n" for line in lines).encode("utf-8")
+        with open(tempPath, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tempPath, self.path)
+        self.valid = len(data)
+        self.pending = []
+        self.rewrite = False
+
+def PlanEntries(dest, entries, initial, counter, prefix, suffix, override, plan, journal=None):
+    # Add the sorted entries to the plan numbering them from initial, returns the next counter value and how
+    # many entries the journal shows as already copied
+    skipped = 0
+    for entry in entries:
+        dir, name, ext = SplitFilepath(entry.path)
+        sourceName = os.path.join(dir, name + ext)
+
+        record = journal.Get(sourceName) if journal is not None else None
+        if record is not None:
+            destName = os.path.join(dest, record[2])
+            if journal.IsCopied(record, entry, destName):
+                skipped += 1
+                continue
+        else:
+            destNameCounter = prefix + str(initial) + suffix
+            destName = ""
+            if override:
+                destName = os.path.join(dest, destNameCounter + ext)
+            else:
+                destName = os.path.join(dest, name + destNameCounter + ext)
+            initial += counter
+
+        if journal is not None:
+            journal.Plan(sourceName, entry, destName)
+        plan[destName] = sourceName
+    return initial, skipped
+
+def ScanSources(sourceList, quiet=False, withStat=False, stats=None):
+    # Yield the sorted files of every source directory in turn, only one directory is listed at a time
+    stats = stats or Instrumentation()
+    for source in sourceList:
+        if not quiet:
+            print("Now sorting files in: '" + source + "'")
+        with stats.Phase("scan"):
+            entries = list(ScanDirectory(source, directory=False, shallow=True, withStat=withStat))
+        with stats.Phase("sort"):
+            entries = SortEntryList(entries, directory=False)
+        yield entries
+
+def CopyBatches(batches, planBatch=None, workers=COPY_WORKERS, stats=None, onCopied=None, linker=None, verifier=None):
+    # Copy the (source, destination) pairs planned for every batch on a pipeline, so copying starts as soon as
+    # the first batch is planned, returns the (source, destination, error) of failed copies. With a FileLinker
+    # files are cloned or hardlinked instead where the destination allows it. With a Verifier copies are checked
+    # against their source once all are done, reusing the source hashes computed while copying, and only count
+    # as copied (onCopied) once they match.
+    stats = stats or Instrumentation()
+    failed = []
+    copied = []
+    if verifier is not None:
+        # file_verifier loads the thread pool modules, so it is only imported to verify
+        from utility_scripts.file_verifier import CopyAndHash
+
+    def CopyData(sourceName, destName):
+        if linker is not None:
+            method = linker.Link(sourceName, destName)
+            if method is not None:
+                return method
+        if verifier is not None:
+            verifier.AddHash(sourceName, CopyAndHash(sourceName, destName))
+        else:
+            shutil.copy(sourceName, destName)
+        return None
+
+    def Copy(sourceName, destName):
+        try:
+            method = CopyData(sourceName, destName)
+            # a hardlink is the source file itself
+            if verifier is not None and method != LINK_HARDLINK:
+                copied.append((sourceName, destName))
+            elif onCopied is not None:
+                onCopied(sourceName, destName)
+            stats.Count(1, os.path.getsize(destName))
+            if stats.listening:
+                stats.Event(LINK_EVENTS[method], source=sourceName, dest=destName)
+        except OSError as error:
+            failed.append((sourceName, destName, error))
+            stats.Error("Failed copying '" + sourceName + "' to '" + destName + "': " + str(error), source=sourceName, dest=destName, error=str(error))
+
+    with stats.Phase("copy"):
+        CopyPipeline(Copy, planBatch, workers=workers, queueSize=workers * COPY_QUEUE_FACTOR).Run(batches)
+    if verifier is not None:
+        mismatched = verifier.Verify(copied, CopyData)
+        failed.extend(mismatched)
+        if onCopied is not None:
+            mismatchedNames = {destName for sourceName, destName, reason in mismatched}
+            for sourceName, destName in copied:
+                if destName not in mismatchedNames:
+                    onCopied(sourceName, destName)
+    return failed
+
+def ArchiveBatches(batches, planBatch, archivePath, format="tar", compression=None, stats=None):
+    # Write the (source, entry name) pairs planned for every batch into an archive in plan order, reading the
+    # next source directory while the files of earlier ones are written. Returns the (source, entry name, error)
+    # of files that could not be read, a failure writing the archive itself stops the run with ArchiveError.
+    stats = stats or Instrumentation()
+    failed = []
+
+    with ArchiveWriter(archivePath, format, compression) as archive:
+        def Copy(sourceName, name):
+            try:
+                size = archive.Add(sourceName, name)
+            except OSError as error:
+                failed.append((sourceName, name, error))
+                stats.Error("Failed archiving '" + sourceName + "' as '" + name + "': " + str(error), source=sourceName, dest=name, error=str(error))
+                return
+            stats.Count(1, size)
+            if stats.listening:
+                stats.Event("archived", source=sourceName, dest=name)
+
+        # a single writer keeps the entries in plan order
+        with stats.Phase("copy"):
+            CopyPipeline(Copy, planBatch, workers=1, queueSize=COPY_WORKERS * COPY_QUEUE_FACTOR).Run(batches)
+    return failed
+
+def CopyPlan(plan, workers=COPY_WORKERS, stats=None, onCopied=None, linker=None, verifier=None):
+    # Copy a plan mapping destination to source names as a single batch
+    return CopyBatches([[(sourceName, destName) for destName, sourceName in plan.items()]], None, workers, stats, onCopied, linker, verifier)
+
+def DoIterativeMerge(dest, sourceList, initial, counter, prefix, suffix, override, verbose=False, quiet=False, workers=COPY_WORKERS, journal=False, link=None, stats=None, verifier=None, archive=None, compression=None):
+    # Every source directory is numbered in turn while the files of earlier ones are being copied. Should two
+    # files map to the same destination the later one is copied last, just as it would overwrite the earlier
+    # one. With a journal files copied by an earlier run are skipped, changed files keep their number and new
+    # files are numbered on from the last run. The plan of every directory is saved before it is copied.
+    # With an archive format dest is a tar or zip file the numbered files are written into instead, in the
+    # same order and under the same names (a journal, link and verifier do not apply to archives).
+    stats = stats or Instrumentation(verbose)
+    copyJournal = CopyJournal(dest, counter, prefix, suffix, override).Load() if journal else None
+    if copyJournal is not None and copyJournal.next is not None:
+        initial = copyJournal.next
+    planned = stats.files
+    skipped = 0
+
+    def PlanBatch(entries):
+        nonlocal initial, planned, skipped
+        plan = {}
+        if copyJournal is None:
+            # entries of an archive are named without a directory
+            initial, batchSkipped = PlanEntries("" if archive else dest, entries, initial, counter, prefix, suffix, override, plan)
+        else:
+            # copies marked in the meantime save the journal too, the plan is saved before it is copied
+            with copyJournal.lock:
+                initial, batchSkipped = PlanEntries(dest, entries, initial, counter, prefix, suffix, override, plan, copyJournal)
+                copyJournal.SetNext(initial)
+            if plan:
+                copyJournal.Save()
+        planned += len(plan)
+        skipped += batchSkipped
+        stats.SetTotal(planned)
+        return [(sourceName, destName) for destName, sourceName in plan.items()]
+
+    batches = ScanSources(sourceList, quiet, copyJournal is not None, stats)
+    if archive:
+        if not quiet:
+            print("Now writing files to archive: '" + dest + "'")
+        failed = ArchiveBatches(batches, PlanBatch, dest, archive, compression, stats)
+    else:
+        if not quiet:
+            print("Now copying files to: '" + dest + "'")
+        failed = CopyBatches(batches, PlanBatch, workers, stats, copyJournal.MarkCopied if copyJournal is not None else None, FileLinker(link) if link else None, verifier)
+    if copyJournal is not None:
+        copyJournal.Save()
+        if not quiet:
+            print("Skipped " + str(skipped) + " files already copied.")
+    if failed and not quiet:
+        print("Failed copying " + str(len(failed)) + " files.")
+    return failed
+
+def DoBulkMerge(dest, source, initial, counter, prefix, suffix, override, verbose=False, quiet=False, workers=COPY_WORKERS, journal=False, link=None, stats=None, verifier=None, archive=None, compression=None):
+    if not quiet:
+        print("Now sorting subdirectories in: '" + source + "'")
+    sortedDirs = [entry.path for entry in SortEntryList(ScanDirectory(source, directory=True, shallow=True), directory=True)]
+    if verbose:
+        print("Sorted subdirectories in order are as follows:")
+        for dir in sortedDirs:
+            print(dir)
+    return DoIterativeMerge(dest, sortedDirs, initial=initial, counter=counter, prefix=prefix, suffix=suffix, override=override, verbose=verbose, quiet=quiet, workers=workers, journal=journal, link=link, stats=stats, verifier=verifier, archive=archive, compression=compression)
+
+class IngestWatcher:
+    # Copies files as they appear in the watched source directories. New or changed files are held until they
+    # have settled, then each batch is numbered in source and natural order on from the journal and copied.
+    # Initial is the first number when nothing was numbered into dest yet.
+    def __init__(self, dest, sourceList, bulk, initial, counter, prefix, suffix, override, verbose=False, quiet=False, workers=COPY_WORKERS, settleTime=WATCH_SETTLE_TIME, link=None, stats=None, verifier=None):
+        self.dest = dest
+        self.sourceList = [os.path.abspath(source) for source in sourceList]
+        self.bulk = os.path.abspath(bulk) if bulk else None
+        self.initial = initial
+        self.counter = counter
+        self.prefix = prefix
+        self.suffix = suffix
+        self.override = override
+        self.verbose = verbose
+        self.quiet = quiet
+        self.workers = workers
+        self.settleTime = settleTime
+        self.linker = FileLinker(link) if link else None
+        self.stats = stats or Instrumentation(verbose)
+        self.verifier = verifier
+        self.journal = CopyJournal(dest, counter, prefix, suffix, override).Load()
+        self.lock = threading.Lock()
+        self.pending = {} # path -> [size, mtime_ns, time of last change, closed]
+        self.stopping = threading.Event()
+
+    def GetSourceKey(self, path):
+        # Sort key placing the file in the order a full run would see its source directory, None if not a source file
+        dir = os.path.dirname(path)
+        if self.bulk:
+            if os.path.dirname(dir) != self.bulk:
+                return None
+            return GetSortKey(GetDirname(dir), directory=True)
+        if dir not in self.sourceList:
+            return None
+        return (self.sourceList.index(dir), "")
+
+    def AddPath(self, path, closed=False):
+        path = os.path.abspath(path)
+        if os.path.basename(path) == JOURNAL_NAME or self.GetSourceKey(path) is None:
+            return
+        with self.lock:
+            state = self.pending.setdefault(path, [None, None, time.monotonic(), False])
+            state[3] = state[3] or closed
+
+    def TakeSettled(self):
+        settled = []
+        now = time.monotonic()
+        with self.lock:
+            for path, state in list(self.pending.items()):
+                try:
+                    pathStat = os.stat(path)
+                except OSError:
+                    del self.pending[path]
+                    continue
+                if [pathStat.st_size, pathStat.st_mtime_ns] != state[:2]:
+                    state[:3] = [pathStat.st_size, pathStat.st_mtime_ns, now]
+                    if not state[3]:
+                        continue
+                if state[3] or now - state[2] >= self.settleTime:
+                    del self.pending[path]
+                    settled.append(ScanEntry(path, os.path.basename(path), False, pathStat.st_size, pathStat.st_mtime_ns))
+        return settled
+
+    def Ingest(self, entries):
+        entries.sort(key=lambda entry: (self.GetSourceKey(entry.path), GetSortKey(entry.name)))
+        plan = {}
+        with self.journal.lock:
+            nextNumber, skipped = PlanEntries(self.dest, entries, self.initial if self.journal.next is None else self.journal.next, self.counter, self.prefix, self.suffix, self.override, plan, self.journal)
+            self.journal.SetNext(nextNumber)
+        if plan:
+            self.journal.Save()
+        failed = CopyPlan(plan, self.workers, self.stats, self.journal.MarkCopied, self.linker, self.verifier)
+        self.journal.Save()
+        if not self.quiet and plan:
+            print("Copied " + str(len(plan) - len(failed)) + " new files to: '" + self.dest + "'")
+
+    def Run(self):
+        while not self.stopping.wait(WATCH_POLL_INTERVAL):
+            entries = self.TakeSettled()
+            if entries:
+                self.Ingest(entries)
+
+def DoWatch(dest, sourceList, bulk, initial, counter, prefix, suffix, override, verbose=False, quiet=False, workers=COPY_WORKERS, settleTime=WATCH_SETTLE_TIME, link=None, stats=None, verifier=None):
+    # watchdog is only needed for this mode
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+
+    if bulk:
+        DoBulkMerge(dest, bulk, initial, counter, prefix, suffix, override, verbose, quiet, workers, journal=True, link=link, stats=stats, verifier=verifier)
+    else:
+        DoIterativeMerge(dest, sourceList, initial, counter, prefix, suffix, override, verbose, quiet, workers, journal=True, link=link, stats=stats, verifier=verifier)
+
+    watcher = IngestWatcher(dest, sourceList or [], bulk, initial, counter, prefix, suffix, override, verbose, quiet, workers, settleTime, link, stats, verifier)
+
+    class IngestEventHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            if event.event_type in ("created", "modified", "closed"):
+                watcher.AddPath(event.src_path, event.event_type == "closed")
+            elif event.event_type == "moved":
+                watcher.AddPath(event.dest_path)
+
+    observer = Observer()
+    eventHandler = IngestEventHandler()
+    if bulk:
+        observer.schedule(eventHandler, bulk, recursive=True)
+    else:
+        for source in sourceList:
+            observer.schedule(eventHandler, source, recursive=False)
+    observer.start()
+    if not quiet:
+        print("Now watching for new files. Press Ctrl + C to terminate program.")
+    try:
+        watcher.Run()
+    except KeyboardInterrupt:
+        pass
+    observer.stop()
+    observer.join()
+
+
+def AddArguments(parser):
+    parser.add_argument("dest", type=str, metavar="destination", help="Path to the destination directory.")
+    sourceGroup = parser.add_mutually_exclusive_group(required=True)
+    sourceGroup.add_argument("-s", "--source", action="append", type=str, help="Path to the source directory holding files to be copied to destination. Each extra argument will add another source directory to the list of directories holding source files.")
+    sourceGroup.add_argument("-b", "--bulk", type=str, help="Path to the directory holding subdirectories of source files that will be copied over to destination.")
+    parser.add_argument("-i", "--initial", type=int, nargs="?", const=0, default=0, help="Set the initial value of the file counter. Default=0")
+    parser.add_argument("-c", "--counter", type=int, nargs="?", const=1, default=1, help="Set the counter step value. Default=1")
+    parser.add_argument("-p", "--prefix", type=str, default="", help="Optional prefix to attach to the counter.")
+    parser.add_argument("-u", "--suffix", type=str, default="", help="Optional suffix to attach to the counter.")
+    parser.add_argument("-o", "--override", action="store_true", help="Overrides the old filename such that the old name is dropped after the operation.")
+    parser.add_argument("-j", "--journal", action="store_true", help="Keep a journal in the destination of the name each source file was copied to. Files already copied by an earlier run are skipped and new files are numbered on from where it stopped, ignoring the initial value.")
+    parser.add_argument("--watch", action="store_true", help="After copying, keep watching the source directories and copy new files as they arrive, numbered on from the last file. Implies --journal. Requires watchdog.")
+    parser.add_argument("--settle", type=float, default=WATCH_SETTLE_TIME, help="Seconds a new file must stay unchanged before it is copied in watch mode, unless the file was closed after writing. Default=" + str(WATCH_SETTLE_TIME))
+    parser.add_argument("-a", "--archive", choices=ARCHIVE_FORMATS, help="Write the numbered files into a tar or zip archive at destination instead of a directory, in the same order and under the same names. The archive is written in a single pass, so destination can also be a pipe. Cannot be used with --journal, --watch, --link or --verify.")
+    parser.add_argument("-z", "--compression", choices=ARCHIVE_COMPRESSIONS, help="Compress the archive with gzip, bzip2 or xz (deflate, bzip2 or lzma entries in a zip).")
+    parser.add_argument("-l", "--link", choices=LINK_MODES, help="Avoid copying file data where the destination filesystem allows it. 'clone' makes copy-on-write clones (btrfs, XFS, ...), 'hardlink' also falls back to hardlinks, which share the file with the source so changing one changes the other. Files are copied normally otherwise.")
+    parser.add_argument("-w", "--workers", type=int, default=COPY_WORKERS, help="Number of files copied concurrently. Numbering is decided before copying so it does not depend on this. Default=" + str(COPY_WORKERS))
+    parser.add_argument("--verify", action="store_true", help="Check every copied file against its source by comparing content hashes once copying is done. Files that do not match are reported and not recorded in the journal.")
+    parser.add_argument("--retries", type=int, default=0, help="Number of times a file that fails verification is copied and verified again. Default=0")
+    parser.add_argument("--progress", action="store_true", help="Show a progress line with the files copied, throughput and estimated time remaining.")
+    parser.add_argument("--events", type=str, metavar="LOG", help="Append a JSON line for every file copied, error and phase of the run to the given log file.")
+    logGroup = parser.add_mutually_exclusive_group()
+    logGroup.add_argument("-v", "--verbose", action="store_true", help="Output actions to the console and show detailed information.")
+    logGroup.add_argument("-q", "--quiet", action="store_true", help="Suppress ouptut to the console.")
+
+def Main(args):
+    args.dest = NormalizePath(args.dest)
+    if args.source:
+        args.source = [NormalizePath(source) for source in args.source]
+    if args.bulk:
+        args.bulk = NormalizePath(args.bulk)
+
+    if not CheckSources(args.source, args.bulk, args.verbose, args.quiet):
+        sys.exit()
+
+    if args.archive and (args.journal or args.watch or args.link or args.verify):
+        if not args.quiet:
+            print("An archive cannot be used with --journal, --watch, --link or --verify.")
+        sys.exit()
+    if args.compression and not args.archive:
+        if not args.quiet:
+            print("Compression requires an archive destination (--archive).")
+        sys.exit()
+
+    # the directory holding an archive has to exist
+    destDir = os.path.dirname(args.dest) if args.archive else args.dest
+    if destDir and not IsValidDirectory(destDir):
+        if not args.quiet:
+            print("The destination path does not exist. Creating directory...")
+        try:
+            os.makedirs(destDir)
+            if args.verbose:
+                print("Created destination directory: " + "'" + destDir + "'")
+        except OSError as error:
+            if args.verbose:
+                print("Failed to create destination directory: '" + destDir + "'")
+            elif not args.quiet:
+                print("Failed to create destination directory.")
+            sys.exit()
+
+    if not args.quiet:
+        print("Starting operation...")
+
+    stats = Instrumentation(args.verbose, args.progress, args.events)
+    verifier = None
+    if args.verify:
+        from utility_scripts.file_verifier import Verifier
+        verifier = Verifier(retries=args.retries, stats=stats)
+    try:
+        if args.watch:
+            DoWatch(args.dest, args.source, args.bulk, args.initial, args.counter, args.prefix, args.suffix, args.override, args.verbose, args.quiet, args.workers, args.settle, args.link, stats, verifier)
+        elif args.source:
+            DoIterativeMerge(args.dest, args.source, args.initial, args.counter, args.prefix, args.suffix, args.override, args.verbose, args.quiet, args.workers, args.journal, args.link, stats, verifier, args.archive, args.compression)
+        elif args.bulk:
+            DoBulkMerge(args.dest, args.bulk, args.initial, args.counter, args.prefix, args.suffix, args.override, args.verbose, args.quiet, args.workers, args.journal, args.link, stats, verifier, args.archive, args.compression)
+    except ArchiveError as error:
+        stats.Close()
+        if not args.quiet:
+            print("Failed writing archive: " + str(error))
+        sys.exit()
+
+    stats.Close()
+    if not args.quiet:
+        print(stats.Summary("Copied"))
+        print("Finished copying files.")
+        sys.exit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    AddArguments(parser)
+    Main(parser.parse_args())
@@ -0,0 +1,172 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+
+
+PIPELINE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+PIPELINE_QUEUE_FACTOR = 4 # max planned copies queued per worker before planning blocks
+PIPELINE_SCAN_AHEAD = 2 # scanned batches waiting to be planned before scanning blocks
+PIPELINE_COPY_CHUNK = 16 # max queued copies a worker takes at once while there is enough work for the others
+PIPELINE_DONE = object() # marks the end of a queue
+
+
+def MakeDirs(path):
+    # a directory that cannot be created fails the copies into it, which report the error
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        pass
+
+class PipelineBatch:
+    # A scanned batch and the number of its copies still running, plus one held by the planner while it queues them
+    def __init__(self, batch, copies):
+        self.batch = batch
+        self.remaining = copies + 1
+
+class CopyPipeline:
+    # Streams work through scan -> plan -> mkdir -> copy -> set metadata stages running on an asyncio loop,
+    # joined by bounded queues, so copying starts with the first scanned batch and memory stays bounded by the
+    # queue sizes however large the tree is. Blocking calls are offloaded to a thread pool.
+    # Run iterates the batches (usually the entries of one directory) on a worker thread. Plan turns each batch
+    # into copy tasks in order, tuples starting with the source and destination name (without plan a batch is
+    # the list of its tasks). With makeDirs the destination directory of every task is created before it is
+    # queued. Copy is called with every task on the pool and setMetadata with every batch once all its copies
+    # finished. Copies to the same destination run one after the other in plan order. Errors are for copy to
+    # report, any exception stops the pipeline and is raised by Run.
+    # With schedule copies are handed to it instead of the pool, schedule is called with a list of tasks and
+    # returns a concurrent Future of their copies so a scheduler can pick the order they run in. Workers then is
+    # the number of lists handed over at once, each up to PIPELINE_COPY_CHUNK tasks.
+    def __init__(self, copy, plan=None, setMetadata=None, makeDirs=False, workers=PIPELINE_WORKERS, queueSize=None, schedule=None):
+        self.copy = copy
+        self.schedule = schedule
+        self.plan = plan
+        self.setMetadata = setMetadata
+        self.makeDirs = makeDirs
+        self.workers = workers
+        self.queueSize = queueSize or workers * PIPELINE_QUEUE_FACTOR
+
+    def Run(self, batches):
+        # asyncio and the thread pool (which loads logging) are only imported once a pipeline runs, they are slow to import
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        # one thread each for scanning, planning and setting metadata next to the copy workers
+        with ThreadPoolExecutor(max_workers=(0 if self.schedule is not None else self.workers) + 3) as executor:
+            asyncio.run(self.RunStages(iter(batches), executor))
+
+    async def RunStages(self, batches, executor):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        scanned = asyncio.Queue(PIPELINE_SCAN_AHEAD)
+        copies = asyncio.Queue(self.queueSize)
+        finished = asyncio.Queue()
+        inFlight = {}
+        stages = [asyncio.ensure_future(self.Scan(loop, executor, batches, scanned)),
+                  asyncio.ensure_future(self.Plan(loop, executor, scanned, copies, finished, inFlight))]
+        stages += [asyncio.ensure_future(self.Copy(loop, executor, copies, finished, inFlight)) for _ in range(self.workers)]
+        metadata = asyncio.ensure_future(self.SetMetadata(loop, executor, finished))
+        try:
+            await asyncio.gather(*stages)
+            finished.put_nowait(PIPELINE_DONE)
+            await metadata
+        finally:
+            for stage in stages + [metadata]:
+                stage.cancel()
+
+    async def Scan(self, loop, executor, batches, scanned):
+        while True:
+            batch = await loop.run_in_executor(executor, next, batches, PIPELINE_DONE)
+            await scanned.put(batch)
+            if batch is PIPELINE_DONE:
+                return
+
+    async def Plan(self, loop, executor, scanned, copies, finished, inFlight):
+        lastDir = None
+        while True:
+            batch = await scanned.get()
+            if batch is PIPELINE_DONE:
+                break
+            tasks = await loop.run_in_executor(executor, self.plan, batch) if self.plan is not None else batch
+            state = PipelineBatch(batch, len(tasks))
+            for task in tasks:
+                # tasks of a batch mostly share their directory, so only changes need to be created
+                destDir = os.path.dirname(task[1])
+                if self.makeDirs and destDir != lastDir:
+                    await loop.run_in_executor(executor, MakeDirs, destDir)
+                    lastDir = destDir
+                previous = inFlight.get(task[1])
+                if previous is not None:
+                    await previous
+                done = inFlight[task[1]] = loop.create_future()
+                await copies.put((task, state, done))
+            self.Release(state, finished)
+        for _ in range(self.workers):
+            await copies.put(PIPELINE_DONE)
+
+    async def Copy(self, loop, executor, copies, finished, inFlight):
+        import asyncio
+        while True:
+            item = await copies.get()
+            if item is PIPELINE_DONE:
+                return
+            # small files are copied faster than a hop to the pool, so a worker takes several while others
+            # still find work in the queue
+            items = [item]
+            # a scheduler takes whatever is queued as it decides what runs at once, up to the end of the queue
+            last = False
+            while len(items) < PIPELINE_COPY_CHUNK and copies.qsize() > (0 if self.schedule is not None else self.workers):
+                item = copies.get_nowait()
+                if item is PIPELINE_DONE:
+                    last = True
+                    break
+                items.append(item)
+            try:
+                if self.schedule is not None:
+                    await asyncio.wrap_future(self.schedule([task for task, state, done in items]))
+                else:
+                    await loop.run_in_executor(executor, self.CopyChunk, [task for task, state, done in items])
+            finally:
+                for task, state, done in items:
+                    done.set_result(None)
+                    if inFlight.get(task[1]) is done:
+                        del inFlight[task[1]]
+            for task, state, done in items:
+                self.Release(state, finished)
+            if last:
+                return
+
+    def CopyChunk(self, tasks):
+        for task in tasks:
+            self.copy(*task)
+
+    def Release(self, state, finished):
+        state.remaining -= 1
+        if state.remaining == 0 and self.setMetadata is not None:
+            finished.put_nowait(state.batch)
+
+    async def SetMetadata(self, loop, executor, finished):
+        while True:
+            batch = await finished.get()
+            if batch is PIPELINE_DONE:
+                return
+            await loop.run_in_executor(executor, self.setMetadata, batch)
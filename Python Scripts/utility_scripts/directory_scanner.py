@@ -0,0 +1,80 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+from collections import namedtuple
+
+
+# size and mtime (in nanoseconds) are None unless the scan was asked to stat entries
+ScanEntry = namedtuple("ScanEntry", ["path", "name", "isDir", "size", "mtime"])
+
+
+def GetDirectoryId(path):
+    pathStat = os.stat(path)
+    return (pathStat.st_dev, pathStat.st_ino)
+
+def ScanDirectory(source, directory=False, shallow=True, withStat=False, followLinks=False, exclude=None):
+    # Yield a ScanEntry for every file (or directory) in source as it is read, one directory at a time so
+    # memory stays bounded by the directories still waiting to be scanned. The entries of a directory are
+    # yielded together before the next directory is opened. Symlinked directories are only descended with
+    # followLinks and then never twice, so links pointing back up the tree cannot loop. Directory None yields
+    # both files and directories. Exclude is called with the source relative path and type of every entry
+    # before it is stated or descended, directories it returns True for are skipped with everything in them.
+    visited = set()
+    if followLinks:
+        visited.add(GetDirectoryId(source))
+    stack = [(source, "")]
+    while stack:
+        path, relDir = stack.pop()
+        try:
+            iterator = os.scandir(path)
+        except OSError:
+            continue
+        subdirs = []
+        with iterator:
+            for entry in iterator:
+                try:
+                    isDir = entry.is_dir()
+                    if not isDir and not entry.is_file():
+                        continue
+                    relPath = os.path.join(relDir, entry.name)
+                    if exclude is not None and exclude(relPath, isDir):
+                        continue
+                    if isDir and not shallow and followLinks:
+                        directoryId = GetDirectoryId(entry.path)
+                        if directoryId not in visited:
+                            visited.add(directoryId)
+                            subdirs.append((entry.path, relPath))
+                    elif isDir and not shallow and not entry.is_symlink():
+                        subdirs.append((entry.path, relPath))
+                    if directory is not None and isDir != directory:
+                        continue
+                    size = mtime = None
+                    if withStat:
+                        entryStat = entry.stat()
+                        size = entryStat.st_size
+                        mtime = entryStat.st_mtime_ns
+                except OSError:
+                    continue
+                yield ScanEntry(entry.path, entry.name, isDir, size, mtime)
+        # reversed so subdirectories are scanned in the order they were listed
+        stack.extend(reversed(subdirs))
@@ -0,0 +1,115 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import errno
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+LINK_CLONE = "clone"
+LINK_HARDLINK = "hardlink"
+LINK_MODES = [LINK_CLONE, LINK_HARDLINK]
+LINK_EVENTS = {None: "copied", LINK_CLONE: "cloned", LINK_HARDLINK: "linked"} # instrumentation event of each method
+FICLONE = 0x40049409 # Linux ioctl sharing the extents of one file with another (btrfs, XFS, ...)
+# errors meaning a method can never work between two devices, rather than failing for a single file
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EPERM}
+
+
+def GetTempName(destName, suffix):
+    destDir, destBase = os.path.split(destName)
+    return os.path.join(destDir, "." + destBase + suffix)
+
+def RemoveFile(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def CloneFile(sourceName, destName):
+    # cloned into a new temporary file replacing dest, writing into an existing dest would truncate every file
+    # sharing it through hardlinks (such as the source of an earlier hardlink merge)
+    if fcntl is None:
+        raise OSError(errno.ENOSYS, "Cloning files is not supported on this platform")
+    tempName = GetTempName(destName, ".clonetmp")
+    RemoveFile(tempName)
+    with open(sourceName, "rb") as sourceFile:
+        tempFd = os.open(tempName, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            try:
+                fcntl.ioctl(tempFd, FICLONE, sourceFile.fileno())
+            finally:
+                os.close(tempFd)
+            shutil.copymode(sourceName, tempName)
+            os.replace(tempName, destName)
+        except BaseException:
+            RemoveFile(tempName)
+            raise
+
+def HardlinkFile(sourceName, destName):
+    # linked under a temporary name first so an existing dest is replaced in one step like a copy would
+    tempName = GetTempName(destName, ".linktmp")
+    RemoveFile(tempName)
+    os.link(sourceName, tempName)
+    os.replace(tempName, destName)
+
+class FileLinker:
+    # Copies files without copying their data where the filesystem allows it: a copy-on-write clone first, then
+    # (only in hardlink mode) a hardlink sharing the source file. Which methods fail for a pair of devices is
+    # remembered so they are not retried for every file. Thread safe.
+    def __init__(self, mode=LINK_CLONE):
+        self.methods = [(LINK_CLONE, CloneFile)]
+        if mode == LINK_HARDLINK:
+            self.methods.append((LINK_HARDLINK, HardlinkFile))
+        self.lock = threading.Lock()
+        self.unsupported = set()
+        self.dirDevices = {}
+
+    def GetDevice(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        device = self.dirDevices.get(directory)
+        if device is None:
+            device = self.dirDevices[directory] = os.stat(directory).st_dev
+        return device
+
+    def Link(self, sourceName, destName):
+        # Returns the method used, or None when the caller has to copy the file
+        try:
+            devices = (self.GetDevice(sourceName), self.GetDevice(destName))
+        except OSError:
+            return None
+        for method, function in self.methods:
+            if (method, devices) in self.unsupported:
+                continue
+            try:
+                function(sourceName, destName)
+                return method
+            except OSError as error:
+                if error.errno in UNSUPPORTED_ERRNOS:
+                    with self.lock:
+                        self.unsupported.add((method, devices))
+        return None
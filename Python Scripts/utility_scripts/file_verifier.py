@@ -0,0 +1,161 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import hashlib
+import mmap
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+VERIFY_WORKERS = min(16, os.cpu_count() or 1)
+VERIFY_QUEUE_FACTOR = 4 # max queued files per worker
+HASH_BUFFER_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 4 * 1024 * 1024 # files at least this large are hashed from a memory map instead of read in chunks
+
+
+def HashFile(path, partialSize=0):
+    # Hash of the whole file, or with partialSize of just its head and tail when it is larger than both together.
+    # blake2b releases the GIL while hashing so files hash in parallel on threads.
+    fileHash = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if partialSize and size > 2 * partialSize:
+            fileHash.update(file.read(partialSize))
+            file.seek(size - partialSize)
+            fileHash.update(file.read(partialSize))
+        elif size >= MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, len(view), HASH_BUFFER_SIZE):
+                        fileHash.update(view[offset:offset + HASH_BUFFER_SIZE])
+                finally:
+                    view.release()
+        else:
+            buffer = bytearray(HASH_BUFFER_SIZE)
+            view = memoryview(buffer)
+            for read in iter(lambda: file.readinto(buffer), 0):
+                fileHash.update(view[:read])
+    return fileHash.hexdigest()
+
+def CopyAndHash(sourceName, destName):
+    # Copy like shutil.copy hashing the data on the way, returns the hash of the source
+    fileHash = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(sourceName, "rb") as sourceFile, open(destName, "wb") as destFile:
+        for read in iter(lambda: sourceFile.readinto(buffer), 0):
+            fileHash.update(view[:read])
+            destFile.write(view[:read])
+    shutil.copymode(sourceName, destName)
+    return fileHash.hexdigest()
+
+def MapBounded(executor, function, items, limit):
+    # executor.map without submitting every item up front, yields results in order
+    pending = deque()
+    for item in items:
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+        pending.append(executor.submit(function, item))
+    while pending:
+        yield pending.popleft().result()
+
+class Verifier:
+    # Verifies copies by comparing the hashes of source and destination, hashed on a pool of workers. Source
+    # hashes computed while copying are reused while the source keeps the size and mtime it was hashed at.
+    # Files that do not match are copied again with recopy and verified again, up to retries times.
+    def __init__(self, workers=VERIFY_WORKERS, retries=0, stats=None):
+        self.workers = workers
+        self.retries = retries
+        self.stats = stats
+        self.known = {}
+        self.lock = threading.Lock()
+
+    def AddHash(self, path, fileHash, pathStat=None):
+        pathStat = pathStat or os.stat(path)
+        with self.lock:
+            self.known[os.path.abspath(path)] = (pathStat.st_size, pathStat.st_mtime_ns, fileHash)
+
+    def GetSourceHash(self, path, pathStat, getHash=None):
+        known = self.known.get(os.path.abspath(path))
+        if known is not None and known[:2] == (pathStat.st_size, pathStat.st_mtime_ns):
+            return known[2]
+        if getHash is not None:
+            return getHash(path, pathStat)
+        return HashFile(path)
+
+    def Check(self, pair, getHash=None):
+        # Returns why the copy does not match its source, None if it does
+        sourceName, destName = pair
+        try:
+            sourceStat = os.stat(sourceName)
+            destSize = os.path.getsize(destName)
+            if destSize != sourceStat.st_size:
+                return "size " + str(destSize) + " instead of " + str(sourceStat.st_size)
+            if HashFile(destName) != self.GetSourceHash(sourceName, sourceStat, getHash):
+                return "content differs"
+        except OSError as error:
+            return str(error)
+        return None
+
+    def Recopy(self, pair, recopy):
+        try:
+            recopy(*pair)
+        except OSError:
+            # verified again and reported with everything else
+            pass
+
+    def Verify(self, pairs, recopy=None, getHash=None):
+        # Returns the (source, destination, reason) of copies still not matching their source. getHash(path, stat)
+        # looks up source hashes the caller already holds, such as those cached by an earlier run.
+        limit = self.workers * VERIFY_QUEUE_FACTOR
+        phase = self.stats.StartPhase("verify") if self.stats is not None else None
+        mismatched = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = pairs
+            for attempt in range(self.retries + 1):
+                mismatched = [(pair, reason) for pair, reason in zip(pending, MapBounded(executor, lambda pair: self.Check(pair, getHash), pending, limit)) if reason is not None]
+                if not mismatched or attempt == self.retries or recopy is None:
+                    break
+                if self.stats is not None and self.stats.listening:
+                    for (sourceName, destName), reason in mismatched:
+                        self.stats.Event("retried", source=sourceName, dest=destName, reason=reason)
+                pending = [pair for pair, reason in mismatched]
+                for _ in MapBounded(executor, lambda pair: self.Recopy(pair, recopy), pending, limit):
+                    pass
+        if phase is not None:
+            self.stats.EndPhase(phase)
+        with self.lock:
+            for sourceName, destName in pairs:
+                self.known.pop(os.path.abspath(sourceName), None)
+        failed = []
+        for (sourceName, destName), reason in mismatched:
+            message = "Verification failed for '" + destName + "' copied from '" + sourceName + "': " + reason
+            if self.stats is not None:
+                self.stats.Error(message, source=sourceName, dest=destName, error=reason)
+            else:
+                print(message)
+            failed.append((sourceName, destName, reason))
+        return failed
@@ -0,0 +1,211 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import json
+import threading
+import time
+
+
+PROGRESS_INTERVAL = 0.5 # minimum seconds between progress line updates
+# console messages of the events shown with verbose output
+EVENT_MESSAGES = {
+    "copied": "Copied '{source}' to '{dest}'",
+    "cloned": "Cloned '{source}' to '{dest}'",
+    "linked": "Linked '{source}' to '{dest}'",
+    "skipped": "Skipped '{source}' identical to '{dest}'",
+    "renamed": "Renamed '{source}' to '{dest}'",
+    "restored": "Renamed '{source}' back to '{dest}'",
+    "purged": "Purged '{path}'",
+    "retried": "Copying '{source}' to '{dest}' again: {reason}",
+}
+
+
+def FormatBytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            break
+        size /= 1024
+    return "{:.1f} {}".format(size, unit)
+
+def FormatDuration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
+
+class Instrumentation:
+    # Counts files, bytes and errors and times the phases of a run, shared by the worker threads. Events go to
+    # the console with verbose, to an optional JSON-lines event log and to any attached hooks (functions called
+    # with every event as a dict, e.g. for profiling). Hot loops check listening before building an event so
+    # nothing is formatted while no one listens. Progress is shown on stderr at most every PROGRESS_INTERVAL.
+    def __init__(self, verbose=False, progress=False, eventLog=None):
+        self.verbose = verbose
+        self.progress = progress
+        self.hooks = []
+        self.eventLog = open(eventLog, "a", encoding="utf-8") if eventLog else None
+        self.listening = verbose or self.eventLog is not None
+        self.lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.totalFiles = None
+        self.totalBytes = None
+        self.phases = {}
+        self.devices = {} # label -> [files, bytes read, bytes written, busy seconds]
+        self.startTime = time.monotonic()
+        self.lastProgress = 0.0
+
+    def AddHook(self, hook):
+        self.hooks.append(hook)
+        self.listening = True
+
+    def SetTotal(self, files=None, bytes=None):
+        # Expected totals, for the percentage and ETA of the progress line
+        self.totalFiles = files
+        self.totalBytes = bytes
+
+    def Count(self, files=1, bytes=0):
+        with self.lock:
+            self.files += files
+            self.bytes += bytes
+        if self.progress:
+            self.ShowProgress()
+
+    def CountDevice(self, label, files, read, written, busy):
+        # I/O of a device over a run, busy being the time any file was copied from or to it
+        with self.lock:
+            counts = self.devices.setdefault(label, [0, 0, 0, 0.0])
+            counts[0] += files
+            counts[1] += read
+            counts[2] += written
+            counts[3] += busy
+
+    def Event(self, kind, **fields):
+        if self.verbose:
+            # one write per line so lines of concurrent workers do not interleave
+            sys.stdout.write(EVENT_MESSAGES[kind].format(**fields) + "\n")
+        self.Emit(kind, fields)
+
+    def Error(self, message, **fields):
+        # Errors are always shown on the console
+        with self.lock:
+            self.errors += 1
+        sys.stdout.write(message + "\n")
+        if self.listening:
+            self.Emit("error", dict(fields, message=message))
+
+    def Emit(self, kind, fields):
+        if self.eventLog is None and not self.hooks:
+            return
+        event = {"event": kind, "time": round(time.monotonic() - self.startTime, 6)}
+        event.update(fields)
+        for hook in self.hooks:
+            hook(event)
+        if self.eventLog is not None:
+            line = json.dumps(event) + "\n"
+            with self.lock:
+                self.eventLog.write(line)
+
+    def StartPhase(self, name):
+        if self.listening:
+            self.Emit("phase_start", {"phase": name})
+        return (name, time.monotonic())
+
+    def EndPhase(self, phase):
+        name, startTime = phase
+        duration = time.monotonic() - startTime
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+        if self.listening:
+            self.Emit("phase_end", {"phase": name, "duration": round(duration, 6)})
+
+    def Phase(self, name):
+        return InstrumentationPhase(self, name)
+
+    def ShowProgress(self, final=False):
+        now = time.monotonic()
+        if not final and now - self.lastProgress < PROGRESS_INTERVAL:
+            return
+        # only one thread draws the line, the others carry on
+        if not self.lock.acquire(blocking=final):
+            return
+        try:
+            self.lastProgress = now
+            elapsed = max(now - self.startTime, 1e-6)
+            line = str(self.files)
+            if self.totalFiles:
+                line += "/" + str(self.totalFiles) + " files (" + "{:.0f}".format(100 * self.files / self.totalFiles) + "%)"
+            else:
+                line += " files"
+            if self.bytes:
+                line += ", " + FormatBytes(self.bytes)
+            line += ", " + "{:.1f}".format(self.files / elapsed) + " files/s"
+            if self.bytes:
+                line += ", " + FormatBytes(self.bytes / elapsed) + "/s"
+            if self.totalFiles and self.files and not final:
+                line += ", ETA " + FormatDuration(elapsed * (self.totalFiles - self.files) / self.files)
+            if self.errors:
+                line += ", " + str(self.errors) + " errors"
+            sys.stderr.write("\r" + line.ljust(79))
+            sys.stderr.flush()
+        finally:
+            self.lock.release()
+
+    def Summary(self, verb="Processed", details=()):
+        elapsed = max(time.monotonic() - self.startTime, 1e-6)
+        # runs that move no data (renames) leave the bytes out
+        if self.bytes or details:
+            summary = (verb + " " + str(self.files) + " files (" + ", ".join([FormatBytes(self.bytes)] + list(details)) + ") in " + "{:.2f}".format(elapsed) + "s at "
+                       + "{:.1f}".format(self.files / elapsed) + " files/s, " + FormatBytes(self.bytes / elapsed) + "/s with ")
+        else:
+            summary = verb + " " + str(self.files) + " files in " + "{:.2f}".format(elapsed) + "s at " + "{:.1f}".format(self.files / elapsed) + " files/s with "
+        summary += str(self.errors) + " errors"
+        if self.phases:
+            summary += " (" + ", ".join(name + " " + "{:.2f}".format(duration) + "s" for name, duration in self.phases.items()) + ")"
+        # a line for each device, throughput being the bytes read and written while it was busy
+        for label, (files, read, written, busy) in self.devices.items():
+            summary += ("\n  " + label + ": " + str(files) + " files, " + FormatBytes(read) + " read, " + FormatBytes(written) + " written, busy "
+                        + "{:.2f}".format(busy) + "s at " + FormatBytes((read + written) / max(busy, 1e-6)) + "/s")
+        return summary
+
+    def Close(self):
+        if self.progress:
+            self.ShowProgress(final=True)
+            sys.stderr.write("\n")
+        if self.eventLog is not None:
+            self.Emit("summary", {"files": self.files, "bytes": self.bytes, "errors": self.errors, "phases": self.phases, "devices": self.devices})
+            self.eventLog.close()
+            self.eventLog = None
+
+class InstrumentationPhase:
+    # Context manager timing a phase, phases of the same name add up
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.phase = self.instrumentation.StartPhase(self.name)
+        return self
+
+    def __exit__(self, *exception):
+        self.instrumentation.EndPhase(self.phase)
+        return False
@@ -0,0 +1,343 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import threading
+import time
+from collections import deque
+
+
+SCHEDULER_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+ROTATIONAL_WORKERS = 2 # concurrent copies on a spinning disk unless limited otherwise, more only make it seek
+LARGE_FILE_THRESHOLD = 16 * 1024 * 1024 # files at least this large are queued apart from small ones
+RATE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def ParseRate(text):
+    # Bytes per second from a number with an optional K, M or G suffix (powers of 1024), e.g. 50M
+    text = text.strip().upper()
+    if text[-1:] in RATE_UNITS:
+        rate = float(text[:-1]) * RATE_UNITS[text[-1]]
+    else:
+        rate = float(text)
+    if rate <= 0:
+        raise ValueError("rate must be positive: " + text)
+    return rate
+
+def ParseDeviceLimit(text):
+    # (path, concurrency, bandwidth) from PATH=CONCURRENCY[,RATE], either limit can be left empty
+    path, separator, limits = text.rpartition("=")
+    if not separator or not path:
+        raise ValueError("expected PATH=CONCURRENCY[,RATE]: " + text)
+    workers, separator, rate = limits.partition(",")
+    workers = int(workers) if workers.strip() else None
+    if workers is not None and workers < 1:
+        raise ValueError("concurrency must be at least 1: " + text)
+    return path, workers, ParseRate(rate) if rate.strip() else None
+
+def FormatDevice(device):
+    if device is None:
+        return "unknown"
+    if hasattr(os, "major"):
+        return str(os.major(device)) + ":" + str(os.minor(device))
+    return str(device)
+
+def IsRotational(device):
+    # Linux tells whether the disk behind a block device spins, partitions find it in their parent disk
+    if device is None or not hasattr(os, "major"):
+        return False
+    base = "/sys/dev/block/" + FormatDevice(device)
+    for path in (base + "/queue/rotational", base + "/../queue/rotational"):
+        try:
+            with open(path, "r") as file:
+                return file.read().strip() == "1"
+        except OSError:
+            pass
+    return False
+
+def GetMountPoint(path):
+    # Topmost directory above path still on the same device
+    path = os.path.abspath(path)
+    device = os.stat(path).st_dev
+    while True:
+        parent = os.path.dirname(path)
+        try:
+            if parent == path or os.stat(parent).st_dev != device:
+                return path
+        except OSError:
+            return path
+        path = parent
+
+class DeviceLimits:
+    # Concurrency and bandwidth (bytes/s) limits of the devices copies read from and write to. The limits of a
+    # path apply to the device holding it, the defaults to every other device. Concurrency None runs
+    # ROTATIONAL_WORKERS copies at once on a spinning disk and does not limit other devices, bandwidth None
+    # does not limit.
+    def __init__(self, workers=None, bandwidth=None, paths=()):
+        self.workers = workers
+        self.bandwidth = bandwidth
+        self.paths = list(paths)
+
+    def Resolve(self):
+        # device -> (concurrency, bandwidth) set for the paths on it
+        devices = {}
+        for path, workers, bandwidth in self.paths:
+            devices[os.stat(path).st_dev] = (workers, bandwidth)
+        return devices
+
+class DeviceState:
+    # Slots, pacing and counters of a device, guarded by the condition of the scheduler
+    def __init__(self, label, workers, bandwidth):
+        self.label = label
+        self.workers = workers
+        self.largeWorkers = max(1, workers // 2)
+        self.bandwidth = bandwidth
+        self.running = 0
+        self.runningLarge = 0
+        self.nextFree = 0.0
+        self.files = 0
+        self.read = 0
+        self.written = 0
+        self.busy = 0.0
+        self.busySince = 0.0
+
+    def CanStart(self, large):
+        return self.running < self.workers and (not large or self.runningLarge < self.largeWorkers)
+
+    def Start(self, large, now):
+        if self.running == 0:
+            self.busySince = now
+        self.running += 1
+        self.runningLarge += large
+
+    def Finish(self, large, now):
+        self.running -= 1
+        self.runningLarge -= large
+        if self.running == 0:
+            self.busy += now - self.busySince
+
+class IoScheduler:
+    # Runs copies on a pool of workers, queued by the devices (st_dev) of their source and destination so every
+    # device runs at its own concurrency: a slow disk is not thrashed while copies between other devices go
+    # ahead, and fast devices are not held back to its pace. Files of at least LARGE_FILE_THRESHOLD are queued
+    # apart from small ones and hold at most half the slots of a device, so large files keep it streaming while
+    # small files fill the other slots instead of waiting behind them. Queues of device pairs take turns.
+    # On a device with a bandwidth limit copies are passed a throttle to call with the bytes they moved, which
+    # pauses them to keep to the limit. The bytes and busy time of every device go to stats on Close.
+    def __init__(self, workers=SCHEDULER_WORKERS, limits=None, stats=None):
+        self.workers = workers
+        self.limits = limits or DeviceLimits()
+        self.pathLimits = self.limits.Resolve()
+        self.stats = stats
+        self.condition = threading.Condition()
+        self.devices = {}
+        self.dirDevices = {}
+        self.queues = {} # (source device, dest device) -> (small copies, large copies), in turn order
+        self.queued = 0
+        self.idle = 0 # workers not running a job
+        self.closing = False
+        self.threads = []
+
+    def GetDevice(self, path):
+        directory = os.path.dirname(path) or os.curdir
+        device = self.dirDevices.get(directory, False)
+        if device is not False:
+            return device
+        try:
+            device = os.stat(directory).st_dev
+        except OSError:
+            # the copy reports the error
+            device = None
+        with self.condition:
+            self.dirDevices[directory] = device
+            if device not in self.devices:
+                self.devices[device] = self.CreateDeviceState(device, directory)
+        return device
+
+    def CreateDeviceState(self, device, directory):
+        workers, bandwidth = self.pathLimits.get(device, (None, None))
+        workers = workers or self.limits.workers
+        if workers is None and IsRotational(device):
+            workers = ROTATIONAL_WORKERS
+        label = FormatDevice(device)
+        if device is not None:
+            label = "'" + GetMountPoint(directory) + "' (" + label + ")"
+        return DeviceState(label, min(workers or self.workers, self.workers), bandwidth or self.limits.bandwidth)
+
+    def Submit(self, function, sourceName, destName, size, *args):
+        # Queue function(sourceName, destName, *args, throttle=...) copying size bytes, returns its Future. The
+        # function returns the bytes it moved (None for size), throttle is None unless a device is paced.
+        return self.SubmitMany(function, [(sourceName, destName, size) + args])
+
+    def SubmitMany(self, function, tasks):
+        # Submit every (sourceName, destName, size, *args) task, returns a single Future done once all are. Small
+        # files between the same devices run one after the other in a single slot, which saves a handoff each.
+        batch = SchedulerBatch()
+        jobs = {}
+        for task in tasks:
+            devices = (self.GetDevice(task[0]), self.GetDevice(task[1]))
+            if task[2] >= LARGE_FILE_THRESHOLD:
+                batch.jobs.append((devices, True, [task]))
+            else:
+                job = jobs.get(devices)
+                if job is None:
+                    job = jobs[devices] = (devices, False, [])
+                    batch.jobs.append(job)
+                job[2].append(task)
+        batch.remaining = len(batch.jobs)
+        with self.condition:
+            for devices, large, jobTasks in batch.jobs:
+                queues = self.queues.get(devices)
+                if queues is None:
+                    queues = self.queues[devices] = (deque(), deque())
+                queues[large].append((batch, function, jobTasks))
+            self.queued += len(batch.jobs)
+            # workers are started as they are needed
+            while len(self.threads) < self.workers and self.idle < self.queued:
+                thread = threading.Thread(target=self.Work, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+                self.idle += 1
+            self.condition.notify(len(batch.jobs))
+        return batch.future
+
+    def Take(self):
+        # Next job whose devices have a free slot, large files first as they keep a device busy the longest
+        for devices, queues in self.queues.items():
+            source, dest = devices
+            states = (self.devices[source],) if source == dest else (self.devices[source], self.devices[dest])
+            for large in (True, False):
+                if queues[large] and all(state.CanStart(large) for state in states):
+                    job = queues[large].popleft()
+                    # the pair goes to the back of the turn order
+                    del self.queues[devices]
+                    if queues[0] or queues[1]:
+                        self.queues[devices] = queues
+                    self.queued -= 1
+                    now = time.monotonic()
+                    for state in states:
+                        state.Start(large, now)
+                    return job, devices, states, large
+        return None
+
+    def Work(self):
+        while True:
+            with self.condition:
+                taken = self.Take()
+                while taken is None:
+                    if self.closing and not self.queued:
+                        # the other workers waiting are woken to exit too
+                        self.condition.notify_all()
+                        return
+                    self.condition.wait()
+                    taken = self.Take()
+                self.idle -= 1
+            (batch, function, tasks), devices, states, large = taken
+            paced = [state for state in states if state.bandwidth]
+            moved = 0
+            error = None
+            try:
+                for sourceName, destName, size, *args in tasks:
+                    transfer = Transfer(self, paced)
+                    taskMoved = function(sourceName, destName, *args, throttle=transfer.Throttle if paced else None)
+                    taskMoved = size if taskMoved is None else taskMoved
+                    # whatever the copy did not report is paid for once it is done
+                    if paced and taskMoved > transfer.charged:
+                        transfer.Throttle(taskMoved - transfer.charged)
+                    moved += taskMoved
+            except BaseException as exception:
+                error = exception
+            finally:
+                with self.condition:
+                    now = time.monotonic()
+                    for state in states:
+                        state.Finish(large, now)
+                        state.files += len(tasks)
+                    self.devices[devices[0]].read += moved
+                    self.devices[devices[1]].written += moved
+                    self.idle += 1
+                    # the freed slots may let another job start
+                    self.condition.notify()
+                batch.Finish(error)
+
+    def Pace(self, states, count):
+        # Book count bytes on every paced device, each device is booked on from where its last copy left off
+        now = time.monotonic()
+        wait = 0.0
+        with self.condition:
+            for state in states:
+                state.nextFree = max(state.nextFree, now) + count / state.bandwidth
+                wait = max(wait, state.nextFree - now)
+        if wait > 0:
+            time.sleep(wait)
+
+    def Close(self):
+        # Wait for every queued copy, then report the devices
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.idle = 0
+        self.closing = False
+        if self.stats is not None:
+            for state in self.devices.values():
+                if state.files:
+                    self.stats.CountDevice(state.label, state.files, state.read, state.written, state.busy)
+                    state.files = state.read = state.written = 0
+                    state.busy = 0.0
+
+class SchedulerBatch:
+    # Jobs of a SubmitMany and the Future set once they all finished, with the first error raised by any
+    def __init__(self):
+        # imported once copies are queued, concurrent.futures loads logging
+        from concurrent.futures import Future
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+        self.jobs = []
+        self.remaining = 0
+        self.error = None
+        self.lock = threading.Lock()
+
+    def Finish(self, error):
+        with self.lock:
+            self.remaining -= 1
+            self.error = self.error or error
+            done = self.remaining == 0
+        if done:
+            if self.error is not None:
+                self.future.set_exception(self.error)
+            else:
+                self.future.set_result(None)
+
+class Transfer:
+    # Throttle of a running copy, counting what it already paid for
+    def __init__(self, scheduler, states):
+        self.scheduler = scheduler
+        self.states = states
+        self.charged = 0
+
+    def Throttle(self, count):
+        self.charged += count
+        self.scheduler.Pace(self.states, count)
@@ -0,0 +1,99 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import re
+import fnmatch
+
+
+REGEX_PREFIX = "re:" # patterns starting with this are regular expressions instead of globs
+# names are compared the way the platform compares them
+RULE_FLAGS = re.IGNORECASE if os.name == "nt" else 0
+
+
+def CompileRules(patterns):
+    # Compile glob patterns into one regex matched against entry names and one matched against relative paths
+    # (patterns containing a "/"). Regular expressions are searched for in the "/" separated relative path.
+    nameRules = []
+    pathRules = []
+    for pattern in patterns:
+        if pattern.startswith(REGEX_PREFIX):
+            pathRules.append(".*?(?:" + pattern[len(REGEX_PREFIX):] + ")")
+        elif "/" in pattern.replace(os.sep, "/"):
+            pathRules.append(fnmatch.translate(pattern.replace(os.sep, "/").strip("/")))
+        else:
+            nameRules.append(fnmatch.translate(pattern))
+    nameRegex = re.compile("|".join(nameRules), RULE_FLAGS) if nameRules else None
+    pathRegex = re.compile("|".join(pathRules), RULE_FLAGS) if pathRules else None
+    return nameRegex, pathRegex
+
+def MatchRules(rules, relPath):
+    nameRegex, pathRegex = rules
+    if nameRegex is not None and nameRegex.match(os.path.basename(relPath)):
+        return True
+    return pathRegex is not None and pathRegex.match(relPath.replace(os.sep, "/")) is not None
+
+class PathFilter:
+    # Include and exclude rules in the manner of Robocopy /XD and /XF, compiled once. Paths are relative to the
+    # root being synced. Excluded directories are pruned with everything in them, so callers check a directory
+    # before descending it and a file before stating it. Include rules only apply to files, when given only
+    # files matching one of them are synced.
+    def __init__(self, excludeDirs=(), excludeFiles=(), includeFiles=()):
+        self.excludeDirs = list(excludeDirs)
+        self.excludeFiles = list(excludeFiles)
+        self.includeFiles = list(includeFiles)
+        self.dirRules = CompileRules(self.excludeDirs)
+        self.fileRules = CompileRules(self.excludeFiles)
+        self.includeRules = CompileRules(self.includeFiles)
+        # tells saved state recorded under different rules apart
+        self.key = "filter\0" + "\0".join(["/".join(self.excludeDirs), "/".join(self.excludeFiles), "/".join(self.includeFiles)])
+
+    def IsExcluded(self, relPath, isDir):
+        if isDir:
+            return MatchRules(self.dirRules, relPath)
+        if self.includeFiles and not MatchRules(self.includeRules, relPath):
+            return True
+        return MatchRules(self.fileRules, relPath)
+
+    def IsPathExcluded(self, relPath, isDir):
+        # Also excluded when any directory above it is, for paths not reached by walking the tree (events)
+        parent = os.path.dirname(relPath)
+        while parent:
+            if MatchRules(self.dirRules, parent):
+                return True
+            parent = os.path.dirname(parent)
+        return self.IsExcluded(relPath, isDir)
+
+    def RobocopyArgs(self, source):
+        # Robocopy file arguments and /XD /XF flags for the glob rules, regular expressions cannot be passed on
+        def Quote(patterns, root=None):
+            return "".join(" \"" + (os.path.join(root, pattern) if root and "/" in pattern.replace(os.sep, "/") else pattern) + "\""
+                           for pattern in patterns if not pattern.startswith(REGEX_PREFIX))
+        args = Quote(self.includeFiles)
+        excludeDirs = Quote(self.excludeDirs, source)
+        if excludeDirs:
+            args += " /XD" + excludeDirs
+        excludeFiles = Quote(self.excludeFiles, source)
+        if excludeFiles:
+            args += " /XF" + excludeFiles
+        return args
@@ -0,0 +1,101 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+
+
+def IsWindows():
+    if os.name == "nt":
+        return True
+    return False
+
+def IsLinux():
+    if os.name == "posix":
+        return True
+    return False
+
+def NormalizePath(path):
+    return os.path.normpath(path)
+
+def IsValidDirectory(path):
+    return os.path.isdir(path)
+
+def GetFilename(filepath, extension=False):
+    filename = os.path.split(filepath)[1]
+    if not extension:
+        filename = os.path.splitext(filename)[0]
+    return filename
+
+def GetDirname(dirpath):
+    return os.path.basename(dirpath)
+
+def SplitFilepath(filepath):
+    dir, name_ext = os.path.split(filepath)
+    name, ext = os.path.splitext(name_ext)
+    return dir, name, ext
+
+def SplitPathByMatch(path, prefix=None, suffix=None):
+    if prefix:
+        try:
+            path = path.removeprefix(prefix)
+        except:
+            if path.startswith(prefix):
+                path = path[len(prefix):]
+    if suffix:
+        try:
+            path = path.removesuffix(suffix)
+        except:
+            if path.endswith(suffix):
+                path = path[:-len(suffix)]
+    return path
+
+def RemoveBoundingPathSeperators(path, leading=True, trailing=True):
+    if leading and trailing:
+        return path.strip(os.sep)
+    elif leading:
+        return path.lstrip(os.sep)
+    elif trailing:
+        return path.rstrip(os.sep)
+
+def CheckSources(sourceList=None, bulk=None, verbose=False, quiet=False):
+    # Returns whether every source directory (or the bulk directory) exists, reporting the ones that do not
+    if sourceList:
+        valid = True
+        for source in sourceList:
+            if not IsValidDirectory(source):
+                valid = False
+                if verbose:
+                    print("The source path: '" + source + "'" + " is an invalid directory.")
+                elif not quiet:
+                    print("Some source path(s) are invalid.")
+                    return False
+                else:
+                    return False
+        return valid
+    if not IsValidDirectory(bulk):
+        if verbose:
+            print("The source path: '" + bulk + "'" + " is an invalid directory.")
+        elif not quiet:
+            print("The source path is invalid.")
+        return False
+    return True
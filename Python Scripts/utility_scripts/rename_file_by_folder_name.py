@@ -0,0 +1,384 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import os
+import errno
+import argparse
+import json
+import threading
+from functools import lru_cache
+from itertools import groupby
+if __name__ == "__main__" and not __package__:
+    # run as a script, the package is imported from the directory holding it
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utility_scripts.directory_scanner import ScanDirectory
+from utility_scripts.path_utils import NormalizePath, GetDirname, SplitFilepath, CheckSources
+from utility_scripts.instrumentation import Instrumentation
+
+
+DESCRIPTION = "Rename files from all source directories such that their new name is the same as their immediate directory name. Options for duplicate new filenames can be set by the user. By default a shallow traversal of source directories is performed."
+
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1 # renameat2 flag failing with EEXIST instead of replacing the target
+RENAME_QUEUE_FACTOR = 4 # max planned directories queued per worker before the scan blocks
+
+
+@lru_cache(maxsize=None)
+def LoadRenameat2():
+    # renameat2 is only exposed through libc on Linux (glibc 2.28+), loaded on the first rename
+    if not sys.platform.startswith("linux"):
+        return None
+    import ctypes
+    try:
+        function = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return None
+    function.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    return function
+
+def RenameNoReplace(source, dest):
+    # Atomically rename source to dest, raising FileExistsError rather than replacing an existing dest
+    if os.name == "nt":
+        # never replaces on Windows
+        os.rename(source, dest)
+        return
+    renameat2 = LoadRenameat2()
+    if renameat2 is not None:
+        import ctypes
+        if renameat2(AT_FDCWD, os.fsencode(source), AT_FDCWD, os.fsencode(dest), RENAME_NOREPLACE) == 0:
+            return
+        error = ctypes.get_errno()
+        # EINVAL when the filesystem does not support the flag
+        if error not in (errno.EINVAL, errno.ENOSYS):
+            raise OSError(error, os.strerror(error), source, None, dest)
+    # a new hardlink never replaces an existing file either
+    try:
+        os.link(source, dest)
+    except FileExistsError:
+        raise
+    except OSError:
+        # filesystem without hardlinks, only the check below guards dest
+        if os.path.lexists(dest):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), source, None, dest)
+        os.rename(source, dest)
+        return
+    os.unlink(source)
+
+def GetCounterName(newName, ext, counterValue, prefix, suffix):
+    return newName + prefix + str(counterValue) + suffix + ext
+
+def PlanDirectory(dir, entries, initial, counter, prefix, suffix, keep, skip=()):
+    # Plan the renames of the files in one directory from a single listing of it, returns (path, newPath) pairs.
+    # Names are reserved in the order the renames are applied, so no planned rename lands on an existing name.
+    # Files in skip keep their name, which stays reserved.
+    taken = {os.path.normcase(entry.name) for entry in entries}
+    newName = GetDirname(dir)
+    plan = []
+    # sorted so the numbering is the same on every run, including dry runs
+    for entry in sorted((entry for entry in entries if not entry.isDir), key=lambda entry: entry.name):
+        if skip and os.path.abspath(entry.path) in skip:
+            continue
+        name, ext = os.path.splitext(entry.name)
+        baseName = name + " " + newName if keep else newName
+        candidate = baseName + ext
+        counterValue = initial
+        # a file already carrying one of its candidate names keeps it, so running again changes nothing
+        while candidate != entry.name and os.path.normcase(candidate) in taken:
+            candidate = GetCounterName(baseName, ext, counterValue, prefix, suffix)
+            counterValue += counter
+        if candidate == entry.name:
+            continue
+        taken.add(os.path.normcase(candidate))
+        # free once renamed, a later file may take the old name
+        taken.discard(os.path.normcase(entry.name))
+        plan.append((entry.path, os.path.join(dir, candidate)))
+    return plan
+
+def PlanRename(source, initial, counter, prefix, suffix, keep=False, shallow=True, skip=()):
+    # Yield (directory, plan) for every directory in source with files to rename, listing each directory once.
+    # The scanner yields the entries of one directory together and a group is only complete once the scanner
+    # moved on, so renaming a planned directory never changes what is still being listed.
+    # Directories and files in skip are left alone.
+    entries = ScanDirectory(source, directory=None, shallow=shallow)
+    for dir, dirEntries in groupby(entries, key=lambda entry: os.path.dirname(entry.path)):
+        if os.path.abspath(dir) in skip:
+            continue
+        plan = PlanDirectory(dir, list(dirEntries), initial, counter, prefix, suffix, keep, skip)
+        if plan:
+            yield dir, plan
+
+def ReadUndoLog(logPath):
+    # Returns the renames (old path -> new path, in the order they were made) and the completed directories
+    # recorded since the log was last rolled back. A torn last line from an interrupted run is ignored.
+    renames = {}
+    done = set()
+    try:
+        with open(logPath, "r", encoding="utf-8") as logFile:
+            for line in logFile:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if "rename" in record:
+                    path, newPath = record["rename"]
+                    # a later attempt for the same file replaces the earlier one but keeps its position
+                    renames[path] = newPath
+                elif "done" in record:
+                    done.add(record["done"])
+                elif "undone" in record:
+                    renames.clear()
+                    done.clear()
+    except FileNotFoundError:
+        pass
+    return renames, done
+
+class UndoLog:
+    # Append-only log of the renames of a run. Every rename is logged and synced to disk before it is made, so
+    # an interrupted or unwanted run can always be rolled back. Renames logged together by concurrent workers
+    # share one fsync. Directories whose renames are complete are recorded so a resumed run skips them.
+    def __init__(self, logPath):
+        self.path = os.path.abspath(logPath)
+        self.renames, self.done = ReadUndoLog(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.syncLock = threading.Lock()
+        self.written = 0
+        self.synced = 0
+
+    def Write(self, records):
+        # Returns the sequence number to pass to Sync for the records to be on disk
+        with self.lock:
+            self.file.write("".join(json.dumps(record) + "\n" for record in records))
+            self.written += 1
+            return self.written
+
+    def Sync(self, sequence):
+        with self.syncLock:
+            # another worker may already have synced past these records while this one waited
+            if self.synced >= sequence:
+                return
+            with self.lock:
+                self.file.flush()
+                target = self.written
+            os.fsync(self.file.fileno())
+            self.synced = target
+
+    def LogRenames(self, renames):
+        self.Sync(self.Write([{"rename": [path, newPath]} for path, newPath in renames]))
+
+    def LogDone(self, dir):
+        # not synced, files renamed by a logged rename are never planned again on resume so losing it only
+        # means the rest of the directory is listed again
+        self.Write([{"done": os.path.abspath(dir)}])
+
+    def LogUndone(self):
+        self.Sync(self.Write([{"undone": True}]))
+
+    def Close(self):
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+def ReportRenameError(path, newPath, error, stats=None):
+    message = "Failed renaming '" + path + "' to '" + newPath + "': " + str(error)
+    if stats is None:
+        print(message)
+    else:
+        stats.Error(message, source=path, dest=newPath, error=str(error))
+
+def ApplyRename(path, newPath, initial, counter, prefix, suffix, keep, onAttempt=None, stats=None):
+    # Rename as planned, numbering on from the disk if the name was taken since the directory was listed
+    # (or differs only in case on a case-insensitive filesystem). Returns the new path or None on failure.
+    # onAttempt is called with every fallback name before it is tried.
+    try:
+        RenameNoReplace(path, newPath)
+        return newPath
+    except FileExistsError:
+        pass
+    except OSError as error:
+        ReportRenameError(path, newPath, error, stats)
+        return None
+    dir, name, ext = SplitFilepath(path)
+    baseName = name + " " + GetDirname(dir) if keep else GetDirname(dir)
+    counterValue = initial
+    while True:
+        newPath = os.path.join(dir, GetCounterName(baseName, ext, counterValue, prefix, suffix))
+        counterValue += counter
+        if newPath == path:
+            return path
+        if onAttempt is not None:
+            onAttempt(path, newPath)
+        try:
+            RenameNoReplace(path, newPath)
+            return newPath
+        except FileExistsError:
+            continue
+        except OSError as error:
+            ReportRenameError(path, newPath, error, stats)
+            return None
+
+def RenameDirectory(dir, plan, initial, counter, prefix, suffix, keep, stats, undoLog=None):
+    onAttempt = None
+    if undoLog is not None:
+        undoLog.LogRenames(plan)
+        onAttempt = lambda path, newPath: undoLog.LogRenames([(path, newPath)])
+    for path, newPath in plan:
+        newPath = ApplyRename(path, newPath, initial, counter, prefix, suffix, keep, onAttempt, stats)
+        if newPath is not None:
+            stats.Count()
+            if stats.listening:
+                stats.Event("renamed", source=path, dest=newPath)
+    if undoLog is not None:
+        undoLog.LogDone(dir)
+
+def DoRename(sourceList, initial, counter, prefix, suffix, keep=False, shallow=True, verbose=False, quiet=False, dryRun=False, workers=1, logPath=None, stats=None):
+    # Directories are independent of each other so they are renamed on a pool of workers while the scan goes on.
+    # With an undo log every rename is logged first and directories completed by an earlier run are skipped.
+    stats = stats or Instrumentation(verbose)
+    undoLog = UndoLog(logPath) if logPath and not dryRun else None
+    skip = set()
+    if undoLog is not None:
+        # files already given their new name are left alone, or --keep would append the folder name again
+        skip = undoLog.done | {undoLog.path} | {os.path.abspath(newPath) for newPath in undoLog.renames.values()}
+    # imported once renaming starts, concurrent.futures loads logging
+    from concurrent.futures import ThreadPoolExecutor
+    slots = threading.BoundedSemaphore(workers * RENAME_QUEUE_FACTOR)
+
+    def Rename(dir, plan):
+        try:
+            RenameDirectory(dir, plan, initial, counter, prefix, suffix, keep, stats, undoLog)
+        except OSError as error:
+            stats.Error("Failed renaming files in '" + dir + "': " + str(error), path=dir, error=str(error))
+        finally:
+            slots.release()
+
+    try:
+        with stats.Phase("rename"), ThreadPoolExecutor(max_workers=workers) as executor:
+            for source in sourceList:
+                if shallow and os.path.abspath(source) in skip:
+                    continue
+                if not quiet:
+                    print("Now renaming files in: '" + source + "'")
+                for dir, plan in PlanRename(source, initial, counter, prefix, suffix, keep, shallow, skip):
+                    if dryRun:
+                        for path, newPath in plan:
+                            print("Would rename '" + path + "' to '" + newPath + "'")
+                        continue
+                    slots.acquire()
+                    executor.submit(Rename, dir, plan)
+    finally:
+        if undoLog is not None:
+            undoLog.Close()
+
+def DoUndo(logPath, verbose=False, quiet=False, stats=None):
+    # Roll back the renames recorded in the undo log, most recent first. Files renamed again since, or whose
+    # old name has been taken, are left alone.
+    stats = stats or Instrumentation(verbose)
+    renames = ReadUndoLog(logPath)[0]
+    stats.SetTotal(len(renames))
+    if not quiet:
+        print("Now rolling back " + str(len(renames)) + " renames logged in: '" + logPath + "'")
+    for path, newPath in reversed(list(renames.items())):
+        # a rename logged but never made (the run stopped first) still has its old name
+        if os.path.lexists(path) or not os.path.lexists(newPath):
+            continue
+        try:
+            RenameNoReplace(newPath, path)
+            stats.Count()
+            if stats.listening:
+                stats.Event("restored", source=newPath, dest=path)
+        except OSError as error:
+            stats.Error("Failed renaming '" + newPath + "' back to '" + path + "': " + str(error), source=newPath, dest=path, error=str(error))
+    undoLog = UndoLog(logPath)
+    undoLog.LogUndone()
+    undoLog.Close()
+
+def DoBulkRename(source, initial, counter, prefix, suffix, keep=False, shallow=True, verbose=False, quiet=False, dryRun=False, workers=1, logPath=None, stats=None):
+    if not quiet:
+        print("Now renaming files found within the subdirectories of: '" + source + "'")
+    dirList = [entry.path for entry in ScanDirectory(source, directory=True, shallow=True)]
+    if verbose:
+        print("The list of subdirectories are as follows:")
+        for dir in dirList:
+            print(dir)
+    DoRename(dirList, initial=initial, counter=counter, prefix=prefix, suffix=suffix, keep=keep, shallow=shallow, verbose=verbose, quiet=quiet, dryRun=dryRun, workers=workers, logPath=logPath, stats=stats)
+
+def AddArguments(parser):
+    sourceGroup = parser.add_mutually_exclusive_group(required=True)
+    sourceGroup.add_argument("-s", "--source", action="append", type=str, help="Path to the source directory holding files to be renamed. Each extra argument will add another source directory to the list of directories holding source files.")
+    sourceGroup.add_argument("-b", "--bulk", type=str, help="Path to the directory holding subdirectories of source files to be renamed. (Files in the root directory given will not be renamed.)")
+    sourceGroup.add_argument("--undo", type=str, metavar="LOG", help="Roll back the renames recorded in the given undo log.")
+    parser.add_argument("-i", "--initial", type=int, nargs="?", const=2, default=2, help="Set the initial value of the file counter. (Used to handle multiple files within the same directory.) Default=2")
+    parser.add_argument("-c", "--counter", type=int, nargs="?", const=1, default=1, help="Set the counter step value. Default=1")
+    parser.add_argument("-p", "--prefix", type=str, default="", help="Optional prefix to attach to the counter.")
+    parser.add_argument("-u", "--suffix", type=str, default="", help="Optional suffix to attach to the counter.")
+    parser.add_argument("-d", "--deep", action="store_true", help="Perform a deep traversal of source directories.")
+    parser.add_argument("-k", "--keep", action="store_true", help="Keeps the old filename prepended to the new filename.")
+    parser.add_argument("-l", "--log", type=str, help="Path to an undo log recording every rename before it is made, which --undo can roll back. Running again with the same log resumes an interrupted run, skipping directories it completed.")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of directories renamed concurrently. Default=1")
+    parser.add_argument("-n", "--dry-run", dest="dryRun", action="store_true", help="Print the planned renames without renaming any files.")
+    parser.add_argument("--progress", action="store_true", help="Show a progress line with the files renamed and the rename rate.")
+    parser.add_argument("--events", type=str, metavar="LOG", help="Append a JSON line for every file renamed, error and phase of the run to the given log file.")
+    logGroup = parser.add_mutually_exclusive_group()
+    logGroup.add_argument("-v", "--verbose", action="store_true", help="Output actions to the console and show detailed information.")
+    logGroup.add_argument("-q", "--quiet", action="store_true", help="Suppress ouptut to the console.")
+
+def Main(args):
+    stats = Instrumentation(args.verbose, args.progress, args.events)
+    if args.undo:
+        DoUndo(args.undo, args.verbose, args.quiet, stats)
+        stats.Close()
+        if not args.quiet:
+            print(stats.Summary("Restored"))
+            print("Finished rolling back renames.")
+        sys.exit()
+
+    if args.source:
+        args.source = [NormalizePath(source) for source in args.source]
+    if args.bulk:
+        args.bulk = NormalizePath(args.bulk)
+
+    if not CheckSources(args.source, args.bulk, args.verbose, args.quiet):
+        sys.exit()
+
+    if not args.quiet:
+        print("Starting operation...")
+
+    if args.source:
+        DoRename(args.source, args.initial, args.counter, args.prefix, args.suffix, args.keep, not args.deep, args.verbose, args.quiet, args.dryRun, args.workers, args.log, stats)
+    elif args.bulk:
+        DoBulkRename(args.bulk, args.initial, args.counter, args.prefix, args.suffix, args.keep, not args.deep, args.verbose, args.quiet, args.dryRun, args.workers, args.log, stats)
+
+    stats.Close()
+    if not args.quiet:
+        if not args.dryRun:
+            print(stats.Summary("Renamed"))
+        print("Finished renaming files.")
+        sys.exit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    AddArguments(parser)
+    Main(parser.parse_args())
@@ -0,0 +1,1455 @@
+# MIT License
+#
+# Copyright (c) 2022 WeiJun Syu
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import os
+import errno
+import hashlib
+import json
+import threading
+import time
+import argparse
+import shutil
+import stat
+from itertools import groupby
+if __name__ == "__main__" and not __package__:
+    # run as a script, the package is imported from the directory holding it
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utility_scripts.directory_scanner import ScanDirectory
+from utility_scripts.path_utils import IsWindows, IsLinux, NormalizePath, IsValidDirectory, SplitPathByMatch, RemoveBoundingPathSeperators
+from utility_scripts.file_linker import FileLinker, LINK_MODES, LINK_EVENTS, LINK_CLONE, LINK_HARDLINK
+from utility_scripts.instrumentation import Instrumentation, FormatBytes
+from utility_scripts.path_filter import PathFilter
+from utility_scripts.copy_pipeline import CopyPipeline
+from utility_scripts.io_scheduler import IoScheduler, DeviceLimits, ParseRate, ParseDeviceLimit, ROTATIONAL_WORKERS
+
+
+DESCRIPTION = "Merge/Mirror/Copy one-way or two-way between source and destination (their subdirectories and files). Additionally, allows for continuous syncing of source and destination one-way or two-way. This program uses subprocess and Robocopy to perform operations on the Windows platform and a native multithreaded copy engine elsewhere."
+
+ROBOCOPY_SILENT_FLAGS = " /NFL /NDL /NJH /NJS /nc /ns /np"
+
+SYNC_QUIET_WINDOW = 0.5 # seconds without events before a batch of changes is synced
+SYNC_MAX_LATENCY = 5.0 # seconds after the first event of a batch by which it is synced regardless
+SYNC_STATE_SAVE_INTERVAL = 30.0 # minimum seconds between saves of the two-way sync state during continuous syncing
+IGNORED_EVENT_TYPES = {"opened", "closed_no_write"}
+
+COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+COPY_QUEUE_FACTOR = 4 # max queued copies per worker before the tree walk blocks
+COPY_BUFFER_SIZE = 1024 * 1024
+KERNEL_COPY_SIZE = 64 * 1024 * 1024
+THROTTLED_COPY_SIZE = 4 * 1024 * 1024 # kernel copies on a device with a bandwidth limit, small enough to pace smoothly
+RESUMABLE_THRESHOLD = 256 * 1024 * 1024 # files at least this large are copied in chunks that survive interruptions
+RESUMABLE_CHUNK_SIZE = 64 * 1024 * 1024
+PARTIAL_SUFFIX = ".syncpart"
+JOURNAL_SUFFIX = ".json"
+DELTA_BLOCK_SIZE = 1024 * 1024
+DELTA_THRESHOLD = 64 * 1024 * 1024 # files smaller than this are always copied whole
+HASH_PARTIAL_SIZE = 64 * 1024 # bytes hashed from both the head and tail of a file before hashing all of it
+# errors raised by copy_file_range/sendfile when the filesystem pair does not support them
+KERNEL_COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTSOCK, errno.ENODATA, errno.ETXTBSY}
+
+
+def KernelCopy(copyFunc, sourceFd, destFd, offset, throttle=None):
+    # Copy until EOF, returns the reached offset and whether the copy completed
+    count = KERNEL_COPY_SIZE if throttle is None else THROTTLED_COPY_SIZE
+    while True:
+        try:
+            copied = copyFunc(sourceFd, destFd, offset, count)
+        except OSError as error:
+            if error.errno in KERNEL_COPY_FALLBACK_ERRNOS:
+                return offset, False
+            raise
+        if copied == 0:
+            return offset, True
+        offset += copied
+        if throttle is not None:
+            throttle(copied)
+
+def CopyFileRange(sourceFd, destFd, offset, count):
+    return os.copy_file_range(sourceFd, destFd, count, offset, offset)
+
+def SendFile(sourceFd, destFd, offset, count):
+    # sendfile writes at the current position of destFd which is kept in step with offset
+    return os.sendfile(destFd, sourceFd, offset, count)
+
+def CopyFileData(sourceName, destName, throttle=None):
+    # Copy file contents preferring kernel-side copies, falling back to a buffered copy from wherever the last method stopped.
+    # Throttle is called with the bytes copied after every chunk.
+    with open(sourceName, "rb") as sourceFile, open(destName, "wb") as destFile:
+        sourceFd = sourceFile.fileno()
+        destFd = destFile.fileno()
+        offset = 0
+        done = False
+        if hasattr(os, "copy_file_range"):
+            offset, done = KernelCopy(CopyFileRange, sourceFd, destFd, offset, throttle)
+        if not done and hasattr(os, "sendfile") and IsLinux():
+            os.lseek(destFd, offset, os.SEEK_SET)
+            offset, done = KernelCopy(SendFile, sourceFd, destFd, offset, throttle)
+        if not done:
+            sourceFile.seek(offset)
+            destFile.seek(offset)
+            if throttle is None:
+                shutil.copyfileobj(sourceFile, destFile, COPY_BUFFER_SIZE)
+            else:
+                for chunk in iter(lambda: sourceFile.read(COPY_BUFFER_SIZE), b""):
+                    destFile.write(chunk)
+                    throttle(len(chunk))
+            offset = destFile.tell()
+    return offset
+
+def IsTransferName(name):
+    # Partial files and journals of resumable copies in progress are never synced
+    return name.startswith(".") and (name.endswith(PARTIAL_SUFFIX) or name.endswith(PARTIAL_SUFFIX + JOURNAL_SUFFIX))
+
+def CopyChunk(sourceFd, destFd, offset, count):
+    # Copy up to count bytes at offset between the same offsets of both files, returns the bytes copied
+    start = offset
+    end = offset + count
+    if hasattr(os, "copy_file_range"):
+        try:
+            while offset < end:
+                copied = os.copy_file_range(sourceFd, destFd, end - offset, offset, offset)
+                if copied == 0:
+                    return offset - start
+                offset += copied
+            return offset - start
+        except OSError as error:
+            if error.errno not in KERNEL_COPY_FALLBACK_ERRNOS:
+                raise
+    os.lseek(sourceFd, offset, os.SEEK_SET)
+    os.lseek(destFd, offset, os.SEEK_SET)
+    while offset < end:
+        chunk = os.read(sourceFd, min(COPY_BUFFER_SIZE, end - offset))
+        if not chunk:
+            break
+        data = memoryview(chunk)
+        while data:
+            data = data[os.write(destFd, data):]
+        offset += len(chunk)
+    return offset - start
+
+def ReadJournal(journalName, identity, sourceName, partialName):
+    # Offset to resume a copy from, only trusted if source is unchanged and the last chunk matches it
+    try:
+        with open(journalName, "r", encoding="utf-8") as file:
+            journal = json.load(file)
+        offset = journal["offset"]
+        if journal["source"] != identity or not isinstance(offset, int) or os.path.getsize(partialName) < offset:
+            return 0
+        start = max(0, offset - RESUMABLE_CHUNK_SIZE)
+        with open(sourceName, "rb") as sourceFile, open(partialName, "rb") as partialFile:
+            sourceFile.seek(start)
+            partialFile.seek(start)
+            while start < offset:
+                count = min(COPY_BUFFER_SIZE, offset - start)
+                if sourceFile.read(count) != partialFile.read(count):
+                    return 0
+                start += count
+        return offset
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0
+
+def ResumableCopyFileData(sourceName, destName, throttle=None):
+    # Copy into a partial file next to dest, recording the copied offset in a journal after each chunk is flushed
+    # to disk. An interrupted copy resumes from the journal and the finished file is renamed into place.
+    destDir, destBase = os.path.split(destName)
+    partialName = os.path.join(destDir, "." + destBase + PARTIAL_SUFFIX)
+    journalName = partialName + JOURNAL_SUFFIX
+    sourceStat = os.stat(sourceName)
+    identity = [sourceStat.st_size, sourceStat.st_mtime_ns, sourceStat.st_ino]
+    offset = ReadJournal(journalName, identity, sourceName, partialName)
+    with open(sourceName, "rb", buffering=0) as sourceFile, open(partialName, "r+b" if offset else "wb", buffering=0) as partialFile:
+        partialFile.truncate(offset)
+        while True:
+            copied = CopyChunk(sourceFile.fileno(), partialFile.fileno(), offset, RESUMABLE_CHUNK_SIZE)
+            offset += copied
+            if throttle is not None:
+                throttle(copied)
+            if copied < RESUMABLE_CHUNK_SIZE:
+                break
+            os.fsync(partialFile.fileno())
+            WriteJsonAtomic(journalName, {"source": identity, "offset": offset})
+        os.fsync(partialFile.fileno())
+    os.replace(partialName, destName)
+    RemovePath(journalName, False)
+    return offset
+
+def DeltaCopyFileData(sourceName, destName, throttle=None):
+    # Rewrite only the blocks of an existing dest that differ from source, both files are local so blocks are
+    # compared directly at the same offsets. Returns the size of the file and the number of bytes written.
+    sourceBuffer = bytearray(DELTA_BLOCK_SIZE)
+    destBuffer = bytearray(DELTA_BLOCK_SIZE)
+    offset = 0
+    written = 0
+    with open(sourceName, "rb", buffering=0) as sourceFile, open(destName, "r+b", buffering=0) as destFile:
+        while True:
+            count = sourceFile.readinto(sourceBuffer)
+            if not count:
+                break
+            destCount = destFile.readinto(destBuffer)
+            if count == DELTA_BLOCK_SIZE:
+                same = destCount == count and sourceBuffer == destBuffer
+            else:
+                same = destCount == count and sourceBuffer[:count] == destBuffer[:count]
+            if not same:
+                destFile.seek(offset)
+                destFile.write(memoryview(sourceBuffer)[:count])
+                written += count
+            offset += count
+            if throttle is not None:
+                throttle(count)
+        destFile.truncate(offset)
+    return offset, written
+
+def RemovePath(path, isDir):
+    try:
+        if isDir:
+            shutil.rmtree(path)
+        else:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def IsSameOrNewer(sourceStat, destStat, modTime):
+    # Files already synced share size and mtime, with modTime dest files newer than source are left alone (Robocopy /XO)
+    if modTime and destStat.st_mtime_ns > sourceStat.st_mtime_ns:
+        return True
+    return destStat.st_size == sourceStat.st_size and destStat.st_mtime_ns == sourceStat.st_mtime_ns
+
+def GetRecord(fileStat=None):
+    # Manifest record of a synced entry: [isDir, size, mtime_ns, inode, hash], directories only record their type
+    if fileStat is None:
+        return [1, 0, 0, 0, None]
+    return [0, fileStat.st_size, fileStat.st_mtime_ns, fileStat.st_ino, None]
+
+def IsRecordCurrent(record, sourceStat, modTime):
+    # A recorded file is current if the source is unchanged since it was copied, with modTime older sources are ignored
+    if modTime and record[2] > sourceStat.st_mtime_ns:
+        return True
+    return record[1] == sourceStat.st_size and record[2] == sourceStat.st_mtime_ns and record[3] == sourceStat.st_ino
+
+def DropSubtree(dirs, relDir):
+    for key in [key for key in dirs if key == relDir or key.startswith(relDir + os.sep)]:
+        del dirs[key]
+
+def CollapsePaths(paths):
+    # Drop paths already covered by a parent directory in the set
+    collapsed = []
+    kept = set()
+    for path in sorted(paths, key=len):
+        parent = os.path.dirname(path)
+        while parent and parent not in kept:
+            parent = os.path.dirname(parent)
+        if not parent and path not in kept:
+            kept.add(path)
+            collapsed.append(path)
+    return collapsed
+
+def ScanDestination(destDir):
+    with os.scandir(destDir) as entries:
+        return {entry.name: entry for entry in entries if not IsTransferName(entry.name)}
+
+def WriteJsonAtomic(path, data):
+    # written to a temporary file first so the file on disk is always either the old or the new one
+    tempPath = path + "." + str(os.getpid()) + ".tmp"
+    try:
+        with open(tempPath, "w", encoding="utf-8") as file:
+            json.dump(data, file, separators=(",", ":"))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tempPath, path)
+    except OSError:
+        RemovePath(tempPath, False)
+        raise
+
+def GetManifestDirectory():
+    if IsWindows():
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "sync_folder")
+
+def GetRootId(path):
+    rootStat = os.stat(path)
+    return [rootStat.st_dev, rootStat.st_ino]
+
+class SyncManifest:
+    # On-disk record of what was last synced from source to dest so runs only need to stat the source tree.
+    # Records are grouped by relative directory. A missing, corrupted or foreign manifest is ignored and the
+    # affected directories are rescanned, rebuilding the manifest. Times optionally keeps the mtime of every
+    # dest directory so directories changed by other programs since are rescanned as well.
+    VERSION = 1
+
+    def __init__(self, source, dest, rescan=False, kind=None):
+        key = os.path.abspath(source) + "\0" + os.path.abspath(dest)
+        if kind:
+            key += "\0" + kind
+        self.path = os.path.join(GetManifestDirectory(), hashlib.sha1(key.encode("utf-8", "surrogateescape")).hexdigest() + ".json")
+        self.source = source
+        self.dest = dest
+        self.rescan = rescan
+        self.times = {}
+
+    def Load(self):
+        self.times = {}
+        if self.rescan:
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if (data["version"] != self.VERSION or data["source"] != GetRootId(self.source)
+                    or data["dest"] != GetRootId(self.dest) or not isinstance(data["dirs"], dict)):
+                return None
+            times = data.get("times")
+            self.times = times if isinstance(times, dict) else {}
+            return data["dirs"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def Save(self, dirs, times=None):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            data = {"version": self.VERSION, "source": GetRootId(self.source), "dest": GetRootId(self.dest), "dirs": dirs}
+            if times is not None:
+                data["times"] = times
+            WriteJsonAtomic(self.path, data)
+        except OSError as error:
+            print("Failed saving sync manifest '" + self.path + "': " + str(error))
+
+class CopyStats(Instrumentation):
+    # Also counts the bytes actually written, which delta copies and links keep below the bytes copied
+    def __init__(self, verbose=False, progress=False, eventLog=None):
+        super().__init__(verbose, progress, eventLog)
+        self.written = 0
+
+    def AddFile(self, size, written=None):
+        with self.lock:
+            self.written += size if written is None else written
+        self.Count(1, size)
+
+    def Summary(self):
+        return super().Summary("Copied", [FormatBytes(self.written) + " written"])
+
+def RecopyFile(sourceName, destName):
+    CopyFileData(sourceName, destName)
+    shutil.copystat(sourceName, destName)
+
+class CopyEngine:
+    # Copies files on an IoScheduler, limited per device by deviceLimits, while the tree walk keeps producing
+    # work. With a FileLinker files are cloned or hardlinked instead of copied where the destination allows it.
+    # With a Verifier the copies are checked against their source on Close, copies that still do not match are
+    # counted as failed.
+    def __init__(self, workers=COPY_WORKERS, verbose=False, delta=False, linker=None, stats=None, verifier=None, deviceLimits=None):
+        self.delta = delta
+        self.linker = linker
+        self.stats = stats or CopyStats(verbose)
+        self.verifier = verifier
+        self.copied = []
+        self.failed = []
+        self.scheduler = IoScheduler(workers, deviceLimits, self.stats)
+        self.slots = threading.BoundedSemaphore(workers * COPY_QUEUE_FACTOR)
+
+    def Submit(self, sourceName, destName, size=None):
+        self.slots.acquire()
+        try:
+            future = self.Schedule(sourceName, destName, size)
+        except:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda future: self.slots.release())
+
+    def Schedule(self, sourceName, destName, size=None):
+        # Queue a copy on the scheduler, returns its Future
+        if size is None:
+            try:
+                size = os.path.getsize(sourceName)
+            except OSError:
+                # the copy reports the error
+                size = 0
+        return self.scheduler.Submit(self.CopyFile, sourceName, destName, size)
+
+    def ScheduleMany(self, tasks):
+        # Queue the (sourceName, destName, size) copies on the scheduler, returns a Future of them all
+        return self.scheduler.SubmitMany(self.CopyFile, tasks)
+
+    def CopyFile(self, sourceName, destName, throttle=None):
+        # Returns the bytes written
+        written = None
+        method = None
+        try:
+            sourceSize = os.path.getsize(sourceName)
+            if self.linker is not None:
+                method = self.linker.Link(sourceName, destName)
+            if method is not None:
+                # no data is written, a hardlink already shares the timestamps of the source
+                size, written = sourceSize, 0
+                if method == LINK_CLONE:
+                    shutil.copystat(sourceName, destName)
+            elif self.delta and sourceSize >= DELTA_THRESHOLD and os.path.isfile(destName):
+                size, written = DeltaCopyFileData(sourceName, destName, throttle)
+            elif sourceSize >= RESUMABLE_THRESHOLD:
+                size = ResumableCopyFileData(sourceName, destName, throttle)
+            else:
+                size = CopyFileData(sourceName, destName, throttle)
+            if method is None:
+                shutil.copystat(sourceName, destName)
+        except OSError as error:
+            self.failed.append(destName)
+            self.stats.Error("Failed copying '" + sourceName + "' to '" + destName + "': " + str(error), source=sourceName, dest=destName, error=str(error))
+            return 0
+        self.stats.AddFile(size, written)
+        if self.verifier is not None and method != LINK_HARDLINK:
+            self.copied.append((sourceName, destName))
+        if self.stats.listening:
+            self.stats.Event(LINK_EVENTS[method], source=sourceName, dest=destName)
+        return size if written is None else written
+
+    def Close(self):
+        self.scheduler.Close()
+        if self.verifier is not None and self.copied:
+            # copied again whole, a delta copy cannot fix blocks that were written wrong
+            mismatched = self.verifier.Verify(self.copied, RecopyFile)
+            self.failed.extend(destName for sourceName, destName, reason in mismatched)
+            self.copied = []
+
+def PythonSync(source, dest, modTime, mirror=False, lonely=False, verbose=False, workers=COPY_WORKERS, manifest=None, paths=None, delta=False, linker=None, stats=None, verifier=None, pathFilter=None, deviceLimits=None):
+    # Walk source once queueing copies as they are found. Mirror purges anything in dest not found in source
+    # while lonely only copies files that do not exist in dest at all (Robocopy /XO /XN /XC).
+    # With a manifest dest is only scanned for directories the manifest does not know about or that were
+    # modified since the last sync.
+    # Paths limits the sync to the given source relative files and subtrees. Delta only rewrites the changed
+    # blocks of large files that already exist in dest. Linker clones or hardlinks files instead of copying them.
+    # The summary is printed with verbose unless the caller passed its own stats. Verifier checks the copies.
+    # Entries excluded by pathFilter are neither stated nor descended, and never purged from dest.
+    # Copies run at the concurrency and bandwidth deviceLimits allow for their source and dest device.
+    engine = CopyEngine(workers, verbose, delta, linker, stats, verifier, deviceLimits)
+    phase = engine.stats.StartPhase("mirror" if mirror else "copy")
+    known = manifest.Load() if manifest is not None else None
+    knownTimes = manifest.times if manifest is not None else {}
+    stack = []
+    if paths is None or "" in paths:
+        paths = None
+        synced = {}
+        times = {}
+        stack.append((source, dest, "", False))
+    else:
+        # a partial sync updates the loaded manifest in place, without one there is nothing to save
+        synced = known
+        times = knownTimes if known is not None else None
+
+    def Purge(records, destDir, name, isDir):
+        # Returns whether the dest entry was removed. One that could not be is reported and left in the manifest
+        # with a record that is never current, so the next run tries again.
+        destName = os.path.join(destDir, name)
+        try:
+            RemovePath(destName, isDir)
+        except OSError as error:
+            engine.stats.Error("Failed purging '" + destName + "': " + str(error), path=destName, error=str(error))
+            if records is not None:
+                records[name] = GetRecord() if isDir else [0, -1, 0, 0, None]
+            return False
+        if engine.stats.listening:
+            engine.stats.Event("purged", path=destName)
+        return True
+
+    def MakeDirectory(destName, parents=False):
+        # Returns whether the directory was created, None if it could not be (reported)
+        try:
+            if parents:
+                os.makedirs(destName, exist_ok=True)
+                return False
+            os.mkdir(destName)
+            return True
+        except FileExistsError:
+            return False
+        except OSError as error:
+            engine.stats.Error("Failed creating directory '" + destName + "': " + str(error), path=destName, error=str(error))
+            return None
+
+    def Walk():
+        # Yield every directory that changed with the files to copy into it, entries of dest are created and
+        # purged here while the copies are left to the pipeline
+        for relPath in CollapsePaths(paths or []):
+            sourceName = os.path.join(source, relPath)
+            destName = os.path.join(dest, relPath)
+            parentRel, name = os.path.split(relPath)
+            records = synced.get(parentRel) if synced is not None else None
+            if pathFilter is not None and parentRel and pathFilter.IsPathExcluded(parentRel, True):
+                continue
+            record = records.pop(name, None) if records is not None else None
+            try:
+                sourceStat = os.stat(sourceName)
+            except OSError:
+                sourceStat = None
+            destIsDir = os.path.isdir(destName) if os.path.lexists(destName) else None
+            if pathFilter is not None and pathFilter.IsExcluded(relPath, destIsDir if sourceStat is None else stat.S_ISDIR(sourceStat.st_mode)):
+                if record is not None:
+                    records[name] = record
+                continue
+            if sourceStat is None or not (stat.S_ISDIR(sourceStat.st_mode) or stat.S_ISREG(sourceStat.st_mode)):
+                if mirror and destIsDir is not None:
+                    if not Purge(records, os.path.dirname(destName), name, destIsDir):
+                        continue
+                    yield os.path.dirname(sourceName), os.path.dirname(destName), [], parentRel
+                if synced is not None:
+                    DropSubtree(synced, relPath)
+                continue
+            isDir = stat.S_ISDIR(sourceStat.st_mode)
+            if destIsDir is not None and destIsDir != isDir:
+                if not mirror or not Purge(records, os.path.dirname(destName), name, destIsDir):
+                    continue
+                destIsDir = None
+                record = None
+            if MakeDirectory(os.path.dirname(destName), parents=True) is None:
+                continue
+            if isDir:
+                if records is not None:
+                    records[name] = GetRecord()
+                stack.append((sourceName, destName, relPath, False))
+                continue
+            if destIsDir is not None:
+                if record is not None and record[0] == 0 and IsRecordCurrent(record, sourceStat, modTime):
+                    records[name] = record
+                    continue
+                if record is None and IsSameOrNewer(sourceStat, os.stat(destName), modTime):
+                    if records is not None:
+                        records[name] = GetRecord(sourceStat)
+                    continue
+            if records is not None:
+                records[name] = GetRecord(sourceStat)
+            yield os.path.dirname(sourceName), os.path.dirname(destName), [(sourceName, destName, sourceStat.st_size)], parentRel
+
+        while stack:
+            sourceDir, destDir, relDir, touched = stack.pop()
+            if not touched:
+                created = MakeDirectory(destDir)
+                if created is None:
+                    continue
+                touched = created
+            try:
+                with os.scandir(sourceDir) as entries:
+                    sourceEntries = list(entries)
+                fromManifest = False
+                destTime = os.stat(destDir).st_mtime_ns if times is not None else None
+                if touched:
+                    destEntries = {}
+                elif known is not None and relDir in known and knownTimes.get(relDir) == destTime:
+                    destEntries = known.pop(relDir)
+                    fromManifest = True
+                else:
+                    # files deleted or added in dest by other programs change the directory mtime
+                    destEntries = ScanDestination(destDir)
+            except OSError as error:
+                engine.stats.Error("Failed reading directory '" + sourceDir + "': " + str(error), path=sourceDir, error=str(error))
+                continue
+            records = {}
+            if synced is not None:
+                synced[relDir] = records
+            copies = []
+
+            for entry in sourceEntries:
+                if IsTransferName(entry.name):
+                    continue
+                if pathFilter is not None and pathFilter.IsExcluded(os.path.join(relDir, entry.name), entry.is_dir(follow_symlinks=False)):
+                    continue
+                destEntry = destEntries.pop(entry.name, None)
+                destName = os.path.join(destDir, entry.name)
+                destIsDir = None
+                if destEntry is not None:
+                    destIsDir = destEntry[0] == 1 if fromManifest else destEntry.is_dir(follow_symlinks=False)
+                if entry.is_dir(follow_symlinks=False):
+                    if destIsDir is False:
+                        if not mirror or not Purge(records, destDir, entry.name, False):
+                            continue
+                        touched = True
+                    # created while this directory is being handled so its timestamps are set after
+                    created = False
+                    if destIsDir is not True:
+                        created = MakeDirectory(destName)
+                        if created is None:
+                            continue
+                        touched = touched or created
+                    records[entry.name] = GetRecord()
+                    stack.append((entry.path, destName, os.path.join(relDir, entry.name), created))
+                    if synced is not None and destIsDir is False:
+                        DropSubtree(synced, os.path.join(relDir, entry.name))
+                elif entry.is_file():
+                    sourceStat = entry.stat()
+                    if destIsDir is not None:
+                        if lonely:
+                            continue
+                        if destIsDir:
+                            if not mirror or not Purge(records, destDir, entry.name, True):
+                                continue
+                        elif fromManifest and IsRecordCurrent(destEntry, sourceStat, modTime):
+                            records[entry.name] = destEntry
+                            continue
+                        elif not fromManifest and IsSameOrNewer(sourceStat, destEntry.stat(), modTime):
+                            records[entry.name] = GetRecord(sourceStat)
+                            continue
+                    records[entry.name] = GetRecord(sourceStat)
+                    copies.append((entry.path, destName, sourceStat.st_size))
+                    touched = True
+
+            if mirror:
+                for name, destEntry in destEntries.items():
+                    destIsDir = destEntry[0] == 1 if fromManifest else destEntry.is_dir(follow_symlinks=False)
+                    # like Robocopy excluded entries are left alone in dest too
+                    if pathFilter is not None and pathFilter.IsExcluded(os.path.join(relDir, name), destIsDir):
+                        continue
+                    if not Purge(records, destDir, name, destIsDir):
+                        continue
+                    if destIsDir and paths is not None and synced is not None:
+                        DropSubtree(synced, os.path.join(relDir, name))
+                    touched = True
+            if touched:
+                yield sourceDir, destDir, copies, relDir
+            elif times is not None:
+                times[relDir] = destTime
+
+    def SetMetadata(batch):
+        # copying files into a directory updates its mtime, so its timestamps are set once all are copied
+        sourceDir, destDir, copies, relDir = batch
+        try:
+            shutil.copystat(sourceDir, destDir)
+            if times is not None:
+                times[relDir] = os.stat(destDir).st_mtime_ns
+        except OSError:
+            pass
+
+    try:
+        # every worker hands over chunks of queued copies, enough for the scheduler to find work for every device
+        pipeline = CopyPipeline(None, lambda batch: batch[2], SetMetadata, workers=workers, queueSize=workers * COPY_QUEUE_FACTOR, schedule=engine.ScheduleMany)
+        pipeline.Run(Walk())
+    finally:
+        engine.Close()
+        engine.stats.EndPhase(phase)
+    if manifest is not None and synced is not None:
+        # failed copies are dropped so the next run retries them
+        for destName in engine.failed:
+            relDir = os.path.relpath(os.path.dirname(destName), dest)
+            synced.get("" if relDir == os.curdir else relDir, {}).pop(os.path.basename(destName), None)
+        manifest.Save(synced, times)
+    if verbose and stats is None:
+        print(engine.stats.Summary())
+    return engine.stats
+
+class HashCache:
+    # Content hashes keyed by path, valid while the file keeps the size and mtime they were computed at.
+    # Only entries used during a run are saved so the cache does not outgrow the trees it covers.
+    def __init__(self, source, dest):
+        self.manifest = SyncManifest(source, dest, kind="hashes")
+        self.hashes = self.manifest.Load() or {}
+        self.used = {}
+
+    def GetHash(self, path, pathStat, partial):
+        key = os.path.abspath(path)
+        record = self.used.get(key) or self.hashes.get(key)
+        if record is None or record[0] != pathStat.st_size or record[1] != pathStat.st_mtime_ns:
+            record = [pathStat.st_size, pathStat.st_mtime_ns, None, None]
+        self.used[key] = record
+        index = 2 if partial else 3
+        if record[index] is None:
+            from utility_scripts.file_verifier import HashFile
+            record[index] = HashFile(path, HASH_PARTIAL_SIZE if partial else 0)
+        return record[index]
+
+    def IsSameContent(self, sourceName, sourceStat, destName, destStat=None):
+        # Compare sizes, then hashes of the head and tail, then hashes of the whole files
+        try:
+            if destStat is None:
+                destStat = os.stat(destName)
+            if not stat.S_ISREG(destStat.st_mode) or destStat.st_size != sourceStat.st_size:
+                return False
+            if self.GetHash(sourceName, sourceStat, True) != self.GetHash(destName, destStat, True):
+                return False
+            if sourceStat.st_size <= 2 * HASH_PARTIAL_SIZE:
+                return True
+            return self.GetHash(sourceName, sourceStat, False) == self.GetHash(destName, destStat, False)
+        except OSError:
+            return False
+
+    def Save(self):
+        self.manifest.Save(self.used)
+
+def BuildNameIndex(destDir):
+    # List a destination directory once mapping names to their entries and each (base, ext) to the
+    # entries with a number appended to it and the highest such number
+    destEntries = {}
+    suffixes = {}
+    variants = {}
+    try:
+        with os.scandir(destDir) as entries:
+            for entry in entries:
+                destEntries[entry.name] = entry
+                base, ext = os.path.splitext(entry.name)
+                stem, seperator, number = base.rpartition("_")
+                if seperator and number.isascii() and number.isdigit():
+                    key = (stem, ext)
+                    suffixes[key] = max(suffixes.get(key, 0), int(number))
+                    variants.setdefault(key, []).append(entry)
+    except OSError:
+        # a missing directory or a file in place of it, nothing in it can share a name
+        pass
+    return destEntries, suffixes, variants
+
+def ReserveName(path):
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+        return True
+    except FileExistsError:
+        return False
+
+def StatOrNone(path):
+    # Directories are not followed, other symlinks are
+    try:
+        pathStat = os.lstat(path)
+        if stat.S_ISLNK(pathStat.st_mode):
+            pathStat = os.stat(path)
+    except OSError:
+        return None
+    if stat.S_ISDIR(pathStat.st_mode) or stat.S_ISREG(pathStat.st_mode):
+        return pathStat
+    return None
+
+def ListStats(path, relDir="", pathFilter=None):
+    # entries excluded by pathFilter are left out without being stated
+    stats = {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if IsTransferName(entry.name):
+                    continue
+                try:
+                    isDir = entry.is_dir(follow_symlinks=False)
+                    if pathFilter is not None and pathFilter.IsExcluded(os.path.join(relDir, entry.name), isDir):
+                        continue
+                    if isDir:
+                        stats[entry.name] = entry.stat(follow_symlinks=False)
+                    elif entry.is_file():
+                        stats[entry.name] = entry.stat()
+                except OSError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return stats
+
+def IsDirStat(pathStat):
+    return pathStat is not None and stat.S_ISDIR(pathStat.st_mode)
+
+def IsSideCurrent(pathStat, record, offset):
+    # Compare one side of an entry with its two-way state record [isDir, size, mtime_ns, inode, size, mtime_ns, inode]
+    if pathStat is None or record is None:
+        return pathStat is None and record is None
+    if IsDirStat(pathStat):
+        return record[0] == 1
+    return (record[0] == 0 and record[offset] == pathStat.st_size and record[offset + 1] == pathStat.st_mtime_ns
+            and record[offset + 2] == pathStat.st_ino)
+
+def GetPairRecord(sourceStat, destStat):
+    return [0, sourceStat.st_size, sourceStat.st_mtime_ns, sourceStat.st_ino, destStat.st_size, destStat.st_mtime_ns, destStat.st_ino]
+
+class TwoWaySync:
+    # Two-way sync backed by the state of every entry as of the last sync. Each side is compared with that
+    # state so only the side that changed is propagated, a sync therefore leaves nothing changed behind for
+    # the next one. When both sides changed the source wins (with modTime the newer file wins). Directories
+    # deleted on one side are descended so entries changed on the other side since the last sync survive.
+    # Entries excluded by pathFilter are left alone on both sides.
+    def __init__(self, source, dest, modTime, verbose=False, workers=COPY_WORKERS, rescan=False, delta=False, pathFilter=None, deviceLimits=None):
+        self.source = source
+        self.dest = dest
+        self.modTime = modTime
+        self.verbose = verbose
+        self.workers = workers
+        self.delta = delta
+        self.pathFilter = pathFilter
+        self.deviceLimits = deviceLimits
+        self.manifest = SyncManifest(source, dest, rescan, "twoway" + ("\0" + pathFilter.key if pathFilter is not None else ""))
+        self.state = self.manifest.Load() or {}
+        self.lastSave = time.monotonic()
+        self.copied = []
+        self.pruneDirs = []
+
+    def IsSynced(self, relPath):
+        if not relPath:
+            return False
+        parentRel, name = os.path.split(relPath)
+        record = self.state.get(parentRel, {}).get(name)
+        return (IsSideCurrent(StatOrNone(os.path.join(self.source, relPath)), record, 1)
+                and IsSideCurrent(StatOrNone(os.path.join(self.dest, relPath)), record, 4))
+
+    def IsExcluded(self, relPath, sourceStat, destStat):
+        if self.pathFilter is None:
+            return False
+        return self.pathFilter.IsExcluded(relPath, IsDirStat(sourceStat if sourceStat is not None else destStat))
+
+    def Sync(self, paths=None):
+        engine = CopyEngine(self.workers, self.verbose, self.delta, deviceLimits=self.deviceLimits)
+        self.copied = []
+        self.pruneDirs = []
+        stack = []
+        try:
+            if paths is None or "" in paths:
+                stack.append("")
+            else:
+                for relPath in CollapsePaths(paths):
+                    parentRel, name = os.path.split(relPath)
+                    if self.pathFilter is not None and parentRel and self.pathFilter.IsPathExcluded(parentRel, True):
+                        continue
+                    records = self.state.setdefault(parentRel, {})
+                    sourceStat = StatOrNone(os.path.join(self.source, relPath))
+                    destStat = StatOrNone(os.path.join(self.dest, relPath))
+                    if self.IsExcluded(relPath, sourceStat, destStat):
+                        continue
+                    if self.Reconcile(records, name, relPath, sourceStat, destStat, engine):
+                        stack.append(relPath)
+            while stack:
+                relDir = stack.pop()
+                sourceStats = ListStats(os.path.join(self.source, relDir), relDir, self.pathFilter)
+                destStats = ListStats(os.path.join(self.dest, relDir), relDir, self.pathFilter)
+                records = self.state.setdefault(relDir, {})
+                for name in set(sourceStats) | set(destStats) | set(records):
+                    relPath = os.path.join(relDir, name)
+                    if self.IsExcluded(relPath, sourceStats.get(name), destStats.get(name)):
+                        continue
+                    if self.Reconcile(records, name, relPath, sourceStats.get(name), destStats.get(name), engine):
+                        stack.append(relPath)
+        finally:
+            engine.Close()
+
+        failed = set(engine.failed)
+        for records, name, relPath, oldRecord, destName in self.copied:
+            sourceStat = StatOrNone(os.path.join(self.source, relPath))
+            destStat = StatOrNone(os.path.join(self.dest, relPath))
+            if destName in failed or sourceStat is None or destStat is None:
+                # keeping the old record makes the next sync see the same change again
+                if oldRecord is None:
+                    records.pop(name, None)
+                else:
+                    records[name] = oldRecord
+            else:
+                records[name] = GetPairRecord(sourceStat, destStat)
+        for relPath in reversed(self.pruneDirs):
+            self.PruneDirectory(relPath)
+        self.Save()
+        if self.verbose:
+            print(engine.stats.Summary())
+        return engine.stats
+
+    def Reconcile(self, records, name, relPath, sourceStat, destStat, engine):
+        # Returns whether relPath is a directory that needs to be descended
+        record = records.get(name)
+        sourceIsDir = IsDirStat(sourceStat)
+        destIsDir = IsDirStat(destStat)
+        if sourceIsDir and destIsDir:
+            records[name] = GetRecord()
+            return True
+        if (sourceIsDir and destStat is None) or (destIsDir and sourceStat is None):
+            if record is not None and record[0] == 1:
+                self.pruneDirs.append(relPath)
+            else:
+                os.makedirs(os.path.join(self.dest if sourceIsDir else self.source, relPath), exist_ok=True)
+                records[name] = GetRecord()
+            return True
+
+        sourceChanged = not IsSideCurrent(sourceStat, record, 1)
+        destChanged = not IsSideCurrent(destStat, record, 4)
+        if not sourceChanged and not destChanged:
+            return False
+        if sourceStat is None and destStat is None:
+            records.pop(name, None)
+            return False
+        if sourceChanged and destChanged:
+            if (not sourceIsDir and not destIsDir and sourceStat is not None and destStat is not None
+                    and sourceStat.st_size == destStat.st_size and sourceStat.st_mtime_ns == destStat.st_mtime_ns):
+                records[name] = GetPairRecord(sourceStat, destStat)
+                return False
+            fromSource = True
+            if (self.modTime and sourceStat is not None and destStat is not None and not sourceIsDir and not destIsDir
+                    and destStat.st_mtime_ns > sourceStat.st_mtime_ns):
+                fromSource = False
+        else:
+            fromSource = sourceChanged
+        return self.Propagate(records, name, relPath, fromSource, sourceStat, destStat, engine)
+
+    def Propagate(self, records, name, relPath, fromSource, sourceStat, destStat, engine):
+        if fromSource:
+            fromName, toName = os.path.join(self.source, relPath), os.path.join(self.dest, relPath)
+            fromStat, toStat = sourceStat, destStat
+        else:
+            fromName, toName = os.path.join(self.dest, relPath), os.path.join(self.source, relPath)
+            fromStat, toStat = destStat, sourceStat
+        if toStat is not None and (fromStat is None or IsDirStat(toStat) or IsDirStat(fromStat)):
+            RemovePath(toName, IsDirStat(toStat))
+            if IsDirStat(toStat):
+                DropSubtree(self.state, relPath)
+            if self.verbose:
+                print("Purged '" + toName + "'")
+        if fromStat is None:
+            records.pop(name, None)
+            return False
+        if IsDirStat(fromStat):
+            os.makedirs(toName, exist_ok=True)
+            records[name] = GetRecord()
+            return True
+        os.makedirs(os.path.dirname(toName), exist_ok=True)
+        self.copied.append((records, name, relPath, records.get(name), toName))
+        engine.Submit(fromName, toName, fromStat.st_size)
+        return False
+
+    def PruneDirectory(self, relPath):
+        # Remove a directory deleted on one side once nothing changed since the last sync is left in it
+        sourceName = os.path.join(self.source, relPath)
+        destName = os.path.join(self.dest, relPath)
+        for missing, present in ((sourceName, destName), (destName, sourceName)):
+            if not os.path.lexists(missing) and os.path.isdir(present):
+                try:
+                    os.rmdir(present)
+                except OSError:
+                    return
+                parentRel, name = os.path.split(relPath)
+                self.state.get(parentRel, {}).pop(name, None)
+                DropSubtree(self.state, relPath)
+                if self.verbose:
+                    print("Purged '" + present + "'")
+
+    def Save(self, force=False):
+        # a stale state is safe, entries synced since the last save only look changed on both sides with equal content
+        if force or time.monotonic() - self.lastSave >= SYNC_STATE_SAVE_INTERVAL:
+            self.manifest.Save(self.state)
+            self.lastSave = time.monotonic()
+
+def DoMerge(source, dest, twoway, verbose=False, python=False, link=None, stats=None, verifier=None, pathFilter=None, deviceLimits=None):
+    # Copy all files that share the same filename and skipping all other files
+    stats = stats or CopyStats(verbose)
+    hashCache = HashCache(source, dest)
+    linker = FileLinker(link) if link else None
+    phase = stats.StartPhase("merge")
+    copied = []
+    if verifier is not None:
+        # file_verifier loads the thread pool modules, so it is only imported to verify
+        from utility_scripts.file_verifier import CopyAndHash
+    # names claimed but not copied yet, an interrupted merge removes them again
+    reserved = set()
+    reservedLock = threading.Lock()
+    exclude = pathFilter.IsExcluded if pathFilter is not None else None
+
+    def Scan():
+        # the scanner yields the files of one directory together so each destination directory is indexed once
+        for root, entries in groupby(ScanDirectory(source, directory=False, shallow=False, exclude=exclude), key=lambda entry: os.path.dirname(entry.path)):
+            yield root, list(entries)
+
+    def Plan(batch):
+        # Pick and claim the numbered name of every file whose name is taken in dest by different content
+        root, entries = batch
+        commonRoot = RemoveBoundingPathSeperators(SplitPathByMatch(root, source))
+        destEntries, suffixes, variants = BuildNameIndex(os.path.join(dest, commonRoot))
+        copies = []
+        for entry in entries:
+            file = entry.name
+            if IsTransferName(file):
+                continue
+            # if file exists in destination
+            if file not in destEntries:
+                continue
+            sourceName = entry.path
+            try:
+                sourceStat = os.stat(sourceName)
+            except OSError as error:
+                stats.Error("Failed reading '" + sourceName + "': " + str(error), path=sourceName, error=str(error))
+                continue
+            # seperate the extension from the filename
+            base, ext = os.path.splitext(file)
+            # skip files whose content is already in destination under the name or a number appended one
+            identical = None
+            for destEntry in [destEntries[file]] + variants.get((base, ext), []):
+                try:
+                    if hashCache.IsSameContent(sourceName, sourceStat, destEntry.path, destEntry.stat()):
+                        identical = destEntry.path
+                        break
+                except OSError:
+                    pass
+            if identical:
+                if stats.listening:
+                    stats.Event("skipped", source=sourceName, dest=identical)
+                continue
+            appendValue = suffixes.get((base, ext), 0) + 1
+            while True:
+                # append number to filename without extension and update path
+                destName = os.path.join(dest, commonRoot, base + "_" + str(appendValue) + ext)
+                # claim the new name so a file created by another process since the index was built is never replaced
+                if ReserveName(destName):
+                    with reservedLock:
+                        reserved.add(destName)
+                    copies.append((sourceName, destName, sourceStat))
+                    suffixes[(base, ext)] = appendValue
+                    break
+                appendValue += 1
+        return copies
+
+    def Copy(sourceName, destName, sourceStat, throttle=None):
+        # Returns the bytes written
+        with reservedLock:
+            reserved.discard(destName)
+        try:
+            method = linker.Link(sourceName, destName) if linker is not None else None
+            if method is None and verifier is not None:
+                verifier.AddHash(sourceName, CopyAndHash(sourceName, destName), sourceStat)
+            elif method is None:
+                CopyFileData(sourceName, destName, throttle)
+                shutil.copymode(sourceName, destName)
+        except OSError as error:
+            # the claimed name is given up again
+            RemovePath(destName, False)
+            stats.Error("Failed copying '" + sourceName + "' to '" + destName + "': " + str(error), source=sourceName, dest=destName, error=str(error))
+            return 0
+        if verifier is not None and method != LINK_HARDLINK:
+            copied.append((sourceName, destName))
+        stats.AddFile(sourceStat.st_size, 0 if method is not None else None)
+        if stats.listening:
+            stats.Event(LINK_EVENTS[method], source=sourceName, dest=destName)
+        return 0 if method is not None else sourceStat.st_size
+
+    scheduler = IoScheduler(COPY_WORKERS, deviceLimits, stats)
+    try:
+        CopyPipeline(None, Plan, workers=COPY_WORKERS, queueSize=COPY_WORKERS * COPY_QUEUE_FACTOR,
+                     schedule=lambda tasks: scheduler.SubmitMany(Copy, [(sourceName, destName, sourceStat.st_size, sourceStat) for sourceName, destName, sourceStat in tasks])).Run(Scan())
+    finally:
+        scheduler.Close()
+        for destName in reserved:
+            RemovePath(destName, False)
+        hashCache.Save()
+        stats.EndPhase(phase)
+    if copied:
+        # sources compared with dest while planning are not hashed again, those hashed now are cached for later runs
+        verifier.Verify(copied, shutil.copy, lambda path, pathStat: hashCache.GetHash(path, pathStat, False))
+        hashCache.Save()
+    # Copy all files from source to dest that do not share the same filename
+    if python or not IsWindows():
+        PythonSync(source, dest, False, lonely=True, verbose=verbose, linker=linker, stats=stats, verifier=verifier, pathFilter=pathFilter, deviceLimits=deviceLimits)
+    else:
+        flags = " /COPY:DAT /DCOPY:T /E /Z /J /W:5 /XO /XN /XC"
+        if pathFilter is not None:
+            flags = pathFilter.RobocopyArgs(source) + flags
+        import subprocess
+        batString = "Robocopy \"" + source + "\" \"" + dest + "\"" + flags
+        if not verbose:
+            batString += ROBOCOPY_SILENT_FLAGS
+            subprocess.run(batString, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) #run .bat process
+        else:
+            subprocess.run(batString)
+
+    if twoway:
+        DoMirror(source, dest, False, False, stats=stats, verifier=verifier, pathFilter=pathFilter, deviceLimits=deviceLimits)
+
+def DoMirror(source, dest, modTime, twoway, verbose=False, python=False, rescan=False, paths=None, delta=False, stats=None, verifier=None, pathFilter=None, deviceLimits=None):
+    def DoMirror(source, dest, modTime):
+        if python or not IsWindows():
+            manifest = SyncManifest(source, dest, rescan, "mirror" + ("\0" + pathFilter.key if pathFilter is not None else ""))
+            PythonSync(source, dest, modTime, mirror=True, verbose=verbose, manifest=manifest, paths=paths, delta=delta, stats=stats, verifier=verifier, pathFilter=pathFilter,
+                       deviceLimits=deviceLimits)
+        else:
+            flags = " /MIR /E /Z /J /IT /IS /W:5" # Mirror source to dest in restartable mode with 5s wait delay on retry
+            if modTime:
+                flags += " /XO" # XO specifies that if the file in source is older than the file in dest it will NOT be copied
+            if pathFilter is not None:
+                flags = pathFilter.RobocopyArgs(source) + flags
+            import subprocess
+            batString = "Robocopy \"" + source + "\" \"" + dest + "\"" + flags
+            if not verbose:
+                batString += ROBOCOPY_SILENT_FLAGS
+                subprocess.run(batString, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) #run .bat process
+            else:
+                subprocess.run(batString)
+
+    DoMirror(source, dest, modTime)
+    if twoway:
+        DoMirror(dest, source, modTime)
+
+def DoCopy(source, dest, modTime, twoway, verbose=False, python=False, rescan=False, paths=None, delta=False, stats=None, verifier=None, pathFilter=None, deviceLimits=None):
+    def DoCopy(source, dest, modTime):
+        if python or not IsWindows():
+            manifest = SyncManifest(source, dest, rescan, "copy" + ("\0" + pathFilter.key if pathFilter is not None else ""))
+            PythonSync(source, dest, modTime, verbose=verbose, manifest=manifest, paths=paths, delta=delta, stats=stats, verifier=verifier, pathFilter=pathFilter,
+                       deviceLimits=deviceLimits)
+        else:
+            flags = " /COPY:DAT /DCOPY:T /E /Z /J /IT /IS /W:5"
+            if modTime:
+                flags += " /XO"
+            if pathFilter is not None:
+                flags = pathFilter.RobocopyArgs(source) + flags
+            import subprocess
+            batString = "Robocopy \"" + source + "\" \"" + dest + "\"" + flags
+            if not verbose:
+                batString += ROBOCOPY_SILENT_FLAGS
+                subprocess.run(batString, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) #run .bat process
+            else:
+                subprocess.run(batString)
+
+    DoCopy(source, dest, modTime)
+    if twoway:
+        DoCopy(dest, source, modTime)
+
+class SyncMonitor:
+    # Coalesces watchdog events into batches of dirty paths that are synced by a single worker thread, so at
+    # most one sync per direction is in flight. A batch is synced once no events arrived for quietWindow
+    # seconds or maxLatency seconds after its first event. Events on paths excluded by pathFilter are dropped
+    # before they are batched.
+    def __init__(self, source, dest, modTime, funcOnEvent, verbose=False, python=False, quietWindow=SYNC_QUIET_WINDOW, maxLatency=SYNC_MAX_LATENCY, delta=False, pathFilter=None, deviceLimits=None):
+        self.source = source
+        self.dest = dest
+        self.modTime = modTime
+        self.funcOnEvent = funcOnEvent
+        self.verbose = verbose
+        self.python = python
+        self.quietWindow = quietWindow
+        self.maxLatency = maxLatency
+        self.delta = delta
+        self.pathFilter = pathFilter
+        self.deviceLimits = deviceLimits
+        self.condition = threading.Condition()
+        self.dirty = set()
+        self.firstEventTime = None
+        self.lastEventTime = None
+        self.stopping = False
+        self.eventsReceived = 0
+        self.eventsCoalesced = 0
+        self.eventsSuppressed = 0
+        self.syncsRun = 0
+        self.roots = [source]
+        # watchdog is only needed for continuous syncing
+        from watchdog.observers import Observer
+        self.observer = Observer()
+        self.thread = threading.Thread(target=self.Run, daemon=True)
+
+    def AddEvent(self, event):
+        with self.condition:
+            self.eventsReceived += 1
+            # directory modifications are implied by the events of the entries within
+            if event.event_type in IGNORED_EVENT_TYPES or (event.event_type == "modified" and event.is_directory):
+                self.eventsCoalesced += 1
+                return
+            paths = [event.src_path]
+            if getattr(event, "dest_path", None):
+                paths.append(event.dest_path)
+            dirty = []
+            for path in paths:
+                if IsTransferName(os.path.basename(path)):
+                    continue
+                for root in self.roots:
+                    relPath = os.path.relpath(path, root)
+                    if relPath == os.curdir:
+                        dirty.append("")
+                    # outside the root, names that merely start with .. are inside it
+                    elif relPath != os.pardir and not relPath.startswith(os.pardir + os.sep):
+                        dirty.append(relPath)
+            if self.pathFilter is not None:
+                dirty = [relPath for relPath in dirty if not relPath or not self.pathFilter.IsPathExcluded(relPath, event.is_directory)]
+                if not dirty:
+                    self.eventsSuppressed += 1
+                    return
+            self.dirty.update(dirty)
+            now = time.monotonic()
+            if self.firstEventTime is None:
+                self.firstEventTime = now
+            else:
+                self.eventsCoalesced += 1
+            self.lastEventTime = now
+            self.condition.notify()
+
+    def WaitForBatch(self):
+        with self.condition:
+            while not self.dirty and not self.stopping:
+                self.condition.wait()
+            while self.dirty and not self.stopping:
+                deadline = min(self.lastEventTime + self.quietWindow, self.firstEventTime + self.maxLatency)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            if not self.dirty:
+                return None
+            paths = self.dirty
+            self.dirty = set()
+            self.firstEventTime = None
+            return paths
+
+    def SyncBatch(self, paths):
+        self.funcOnEvent(self.source, self.dest, self.modTime, False, self.verbose, self.python, paths=paths, delta=self.delta, pathFilter=self.pathFilter, deviceLimits=self.deviceLimits)
+        return True
+
+    def Run(self):
+        while True:
+            paths = self.WaitForBatch()
+            if paths is None:
+                return
+            try:
+                synced = self.SyncBatch(paths)
+            except Exception as error:
+                synced = True
+                print("Failed syncing '" + self.source + "' to '" + self.dest + "': " + str(error))
+            if synced:
+                with self.condition:
+                    self.syncsRun += 1
+
+    def Counters(self):
+        with self.condition:
+            return {"eventsReceived": self.eventsReceived, "eventsCoalesced": self.eventsCoalesced,
+                    "eventsSuppressed": self.eventsSuppressed, "syncsRun": self.syncsRun}
+
+    def Start(self):
+        from watchdog.events import LoggingEventHandler
+        monitor = self
+        class SyncEventHandler(LoggingEventHandler):
+            def on_any_event(self, event):
+                monitor.AddEvent(event)
+
+        self.thread.start()
+        syncEventHandler = SyncEventHandler()
+        for root in self.roots:
+            self.observer.schedule(syncEventHandler, root, recursive=True)
+        self.observer.start()
+
+    def Stop(self):
+        # pending changes are synced before the worker exits
+        self.observer.stop()
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+
+    def Join(self):
+        self.observer.join()
+        self.thread.join()
+
+class TwoWaySyncMonitor(SyncMonitor):
+    # Watches both source and dest feeding a single TwoWaySync. Paths already matching the sync state, such as
+    # those written by the previous sync, are suppressed before a batch is run. The first batch is a full sync.
+    def __init__(self, source, dest, modTime, verbose=False, quietWindow=SYNC_QUIET_WINDOW, maxLatency=SYNC_MAX_LATENCY, rescan=False, delta=False, pathFilter=None, deviceLimits=None):
+        super().__init__(source, dest, modTime, None, verbose, True, quietWindow, maxLatency, delta, pathFilter, deviceLimits)
+        self.twoWaySync = TwoWaySync(source, dest, modTime, verbose, rescan=rescan, delta=delta, pathFilter=pathFilter, deviceLimits=deviceLimits)
+        self.roots = [source, dest]
+        self.dirty.add("")
+        self.firstEventTime = self.lastEventTime = time.monotonic()
+
+    def SyncBatch(self, paths):
+        changed = [path for path in paths if not self.twoWaySync.IsSynced(path)]
+        with self.condition:
+            self.eventsSuppressed += len(paths) - len(changed)
+        if not changed:
+            return False
+        self.twoWaySync.Sync(changed)
+        return True
+
+    def Join(self):
+        super().Join()
+        self.twoWaySync.Save(force=True)
+
+def InitMonitor(source, dest, modTime, funcOnEvent, verbose=False, python=False, quietWindow=SYNC_QUIET_WINDOW, maxLatency=SYNC_MAX_LATENCY, delta=False, pathFilter=None, deviceLimits=None):
+    monitor = SyncMonitor(source, dest, modTime, funcOnEvent, verbose, python, quietWindow, maxLatency, delta, pathFilter, deviceLimits)
+    monitor.Start()
+    return monitor
+
+def InitTwoWayMonitor(source, dest, modTime, verbose=False, quietWindow=SYNC_QUIET_WINDOW, maxLatency=SYNC_MAX_LATENCY, rescan=False, delta=False, pathFilter=None, deviceLimits=None):
+    monitor = TwoWaySyncMonitor(source, dest, modTime, verbose, quietWindow, maxLatency, rescan, delta, pathFilter, deviceLimits)
+    monitor.Start()
+    return monitor
+
+def InitLogger():
+    import logging
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+def StartSyncing(source, dest, monitors, twoway=False, quiet=False):
+    print("Now Syncing from '" + source + "' to '" + dest + "'")
+    if twoway:
+        print("And Syncing from '" + dest + "' to '" + source + "'")
+    if not quiet:
+        print("Press Ctrl + C to terminate program.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for monitor in monitors:
+            monitor.Stop()
+    for monitor in monitors:
+        monitor.Join()
+        if not quiet:
+            counters = monitor.Counters()
+            print("'" + monitor.source + "': " + str(counters["eventsReceived"]) + " events received, "
+                  + str(counters["eventsCoalesced"]) + " coalesced, " + str(counters["eventsSuppressed"]) + " suppressed, "
+                  + str(counters["syncsRun"]) + " syncs run")
+
+def AddArguments(parser, command=None):
+    # Arguments of this script, or of a merge, copy, mirror or sync command of utility_scripts which implies the
+    # action instead of taking its flag. The sync command syncs two-way unless asked for one of the one-way syncs.
+    parser.add_argument("source", type=str, help="Path to the source directory.")
+    parser.add_argument("dest", type=str, metavar="destination", help="Path to the destination directory.")
+    if command is None:
+        modeGroup = parser.add_mutually_exclusive_group()
+        modeGroup.add_argument("-m", "--merge", action="store_true",
+                               help="Merge source into destination preserving any files found unique to destination. Files that share a name but differ in content will be appended a number to preserve uniqueness. Ex. original_filename, original_filename_1, original_filename_2, ... , original_filename_6, ...")
+        modeGroup.add_argument("-c", "--copy", action="store_true",
+                               help="Copy source into destination preserving any files found unique to destination. Files that share a name will be overwritten (by the file in source).")
+        modeGroup.add_argument("-i", "--mirror", action="store_true",
+                               help="Mirror source into destination purging any files found unique to destination. Files that share a name will be overwritten (by the file in source).")
+    else:
+        parser.set_defaults(merge=command == "merge", copy=command == "copy", mirror=command == "mirror", sync=command == "sync")
+    contGroup = parser.add_mutually_exclusive_group()
+    if command != "sync":
+        contGroup.add_argument("-s", "--sync", action="store_true",
+                               help="Perform continuous symmetrical mirror syncing (two-way mirror) of the two directories such that they are kept identical. Conflicts are resolved such that the source to destination direction takes precedence. Only changes made since the last sync are propagated, tracked with a saved sync state (Python implementation on all platforms). Performed after initial merge/mirror/copy action. Not affected by the twoway argument.")
+    contGroup.add_argument("-a", "--asymc", action="store_true",
+                           help="Perform continuous asymmetrical copy syncing (one-way copy) of source to destination. Performed after initial merge/mirror/copy action. Not affected by the twoway argument.")
+    contGroup.add_argument("-y", "--asymi", action="store_true",
+                           help="Perform continuous asymmetrical mirror syncing (one-way mirror) of source to destination. Performed after initial merge/mirror/copy action. Not affected by the twoway argument.")
+    parser.add_argument("-t", "--time", dest="modTime", action="store_true",
+                        help="Prevent overwriting files if the file to be overwritten has a more recent date of modification. Does not guarantee file safety as not all actions performed on files modify their timestamp depending on the OS.")
+    parser.add_argument("-w", "--twoway", action="store_true",
+                        help="Perform the initial merge/copy/mirror action bi-directionally. Conflicts are resolved such that the source to destination direction takes precedence.")
+    parser.add_argument("-p", "--python", action="store_true",
+                        help="Perform actions with a purely python implementation within current process. (Always used on non-Windows platforms.)")
+    parser.add_argument("--debounce", type=float, default=SYNC_QUIET_WINDOW,
+                        help="Seconds without file system events to wait before syncing the changed paths during continuous syncing. Default=" + str(SYNC_QUIET_WINDOW))
+    parser.add_argument("--max-latency", dest="maxLatency", type=float, default=SYNC_MAX_LATENCY,
+                        help="Maximum seconds a change waits to be synced during continuous syncing while events keep arriving. Default=" + str(SYNC_MAX_LATENCY))
+    parser.add_argument("-d", "--delta", action="store_true",
+                        help="Only rewrite the changed blocks of files larger than " + FormatBytes(DELTA_THRESHOLD) + " that already exist in the destination instead of copying them whole. (Python implementation only.)")
+    parser.add_argument("-l", "--link", choices=LINK_MODES,
+                        help="Merge without copying file data where the destination filesystem allows it. 'clone' makes copy-on-write clones (btrfs, XFS, ...), 'hardlink' also falls back to hardlinks, which share the file with the source so changing one changes the other. Files are copied normally otherwise. (Python implementation only.)")
+    parser.add_argument("-r", "--rescan", action="store_true",
+                        help="Ignore the saved sync manifest and rescan the destination, rebuilding the manifest. Directories modified since the last sync are rescanned anyway, use after files in the destination were changed in place by other programs. (Python implementation only.)")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check every file copied by the initial merge/copy/mirror action against its source by comparing content hashes. Files that do not match are reported and retried by the next run. (Python implementation only.)")
+    parser.add_argument("--retries", type=int, default=0,
+                        help="Number of times a file that fails verification is copied and verified again. Default=0")
+    parser.add_argument("--progress", action="store_true",
+                        help="Show a progress line with the files copied and throughput during the initial merge/copy/mirror action. (Python implementation only.)")
+    parser.add_argument("--events", type=str, metavar="LOG",
+                        help="Append a JSON line for every file copied or purged, error and phase of the initial merge/copy/mirror action to the given log file. (Python implementation only.)")
+    parser.add_argument("--xd", dest="excludeDirs", action="append", default=[], metavar="PATTERN",
+                        help="Exclude directories matching the pattern, with everything in them, from syncing and watching (like Robocopy /XD). Patterns are globs matched against names, or against source relative paths when they contain a '/'. Patterns starting with 're:' are regular expressions searched for in relative paths (Python implementation only). Excluded directories are left alone in the destination. Can be given multiple times.")
+    parser.add_argument("--xf", dest="excludeFiles", action="append", default=[], metavar="PATTERN",
+                        help="Exclude files matching the pattern from syncing and watching (like Robocopy /XF). Same patterns as --xd. Can be given multiple times.")
+    parser.add_argument("--include", dest="includeFiles", action="append", default=[], metavar="PATTERN",
+                        help="Only sync files matching the pattern, all directories are still traversed. Same patterns as --xd. Can be given multiple times.")
+    parser.add_argument("--device-workers", dest="deviceWorkers", type=int, metavar="N",
+                        help="Number of files copied at once from or to each device. Default: " + str(ROTATIONAL_WORKERS) + " on spinning disks (Linux), otherwise only limited by the total number of copy workers. (Python implementation only.)")
+    parser.add_argument("--bandwidth", type=ParseRate, metavar="RATE",
+                        help="Limit the bytes per second copied from or to each device, with an optional K, M or G suffix. Ex. 50M (Python implementation only.)")
+    parser.add_argument("--device-limit", dest="deviceLimits", action="append", default=[], type=ParseDeviceLimit, metavar="PATH=N[,RATE]",
+                        help="Copy at most N files at once and, with RATE, at most RATE bytes per second from or to the device holding PATH, overriding --device-workers and --bandwidth for it. Either can be left empty. Ex. /mnt/nas=4,20M (Python implementation only.) Can be given multiple times.")
+    logGroup = parser.add_mutually_exclusive_group()
+    logGroup.add_argument("-v", "--verbose", action="store_true",
+                          help="Output actions to the console and show detailed information.")
+    logGroup.add_argument("-q", "--quiet", action="store_true",
+                          help="Do not ask for user confirmation on action and limit console interaction.")
+
+def Main(args):
+    # one-way syncs take precedence over the two-way sync implied by the sync command
+    args.sync = args.sync and not args.asymc and not args.asymi
+
+    if not args.merge and not args.copy and not args.mirror and not args.sync and not args.asymc and not args.asymi:
+        if not args.quiet:
+            input("Please choose at least one option to perform. [-m | -c | -i | -s | -a | -y]")
+        sys.exit()
+
+    args.source = NormalizePath(args.source)
+    args.dest = NormalizePath(args.dest)
+
+    if not IsValidDirectory(args.source):
+        if args.verbose:
+            print("'" + args.source + "'" + " is an invalid directory.")
+            if not args.quiet: # verbose and not quiet
+                input("Press ENTER to terminate the program.")
+        elif not args.quiet: # not verbose and not quiet
+            input("Source path invaild. Press ENTER to terminate the program.")
+        sys.exit()
+
+    if not IsValidDirectory(args.dest):
+        try:
+            os.makedirs(args.dest)
+            if args.verbose:
+                print("Created directory: " + "'" + args.dest + "'")
+        except OSError as error:
+            if args.verbose:
+                print("Failed creating directory: '" + args.dest + "'")
+                if not args.quiet: # verbose and not quiet
+                    input("Press ENTER to terminate the program.")
+            elif not args.quiet: # not verbose and not quiet
+                input("Destination path cannot be created. Press ENTER to terminate the program.")
+            sys.exit()
+
+
+    pathFilter = None
+    if args.excludeDirs or args.excludeFiles or args.includeFiles:
+        pathFilter = PathFilter(args.excludeDirs, args.excludeFiles, args.includeFiles)
+
+    try:
+        deviceLimits = DeviceLimits(args.deviceWorkers, args.bandwidth, args.deviceLimits)
+        deviceLimits.Resolve()
+    except OSError as error:
+        if not args.quiet:
+            input("Device limit path invalid: " + str(error) + ". Press ENTER to terminate the program.")
+        sys.exit()
+
+    if args.merge or args.copy or args.mirror:
+        stats = CopyStats(args.verbose, args.progress, args.events)
+        verifier = None
+        if args.verify:
+            from utility_scripts.file_verifier import Verifier
+            verifier = Verifier(retries=args.retries, stats=stats)
+        if args.merge:
+            DoMerge(args.source, args.dest, args.twoway, args.verbose, args.python, args.link, stats, verifier, pathFilter, deviceLimits)
+        elif args.copy:
+            DoCopy(args.source, args.dest, args.modTime, args.twoway, args.verbose, args.python, args.rescan, delta=args.delta, stats=stats, verifier=verifier, pathFilter=pathFilter,
+                   deviceLimits=deviceLimits)
+        elif args.mirror:
+            DoMirror(args.source, args.dest, args.modTime, args.twoway, args.verbose, args.python, args.rescan, delta=args.delta, stats=stats, verifier=verifier, pathFilter=pathFilter,
+                     deviceLimits=deviceLimits)
+        stats.Close()
+        if args.verbose or (args.progress and not args.quiet):
+            print(stats.Summary())
+
+    if args.sync or args.asymc or args.asymi:
+        InitLogger()
+        monitors = []
+        if args.sync:
+            twoWayMonitor = InitTwoWayMonitor(args.source, args.dest, args.modTime, args.verbose, args.debounce, args.maxLatency, args.rescan, args.delta, pathFilter, deviceLimits)
+            monitors.append(twoWayMonitor)
+        elif args.asymc:
+            sourceMonitor = InitMonitor(args.source, args.dest, args.modTime, DoCopy, args.verbose, args.python, args.debounce, args.maxLatency, args.delta, pathFilter, deviceLimits)
+            monitors.append(sourceMonitor)
+        elif args.asymi:
+            sourceMonitor = InitMonitor(args.source, args.dest, args.modTime, DoMirror, args.verbose, args.python, args.debounce, args.maxLatency, args.delta, pathFilter, deviceLimits)
+            monitors.append(sourceMonitor)
+
+        StartSyncing(args.source, args.dest, monitors, args.twoway, args.quiet)
+        if not args.quiet:
+            print("Program terminated by user.")
+        sys.exit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    AddArguments(parser)
+    Main(parser.parse_args())